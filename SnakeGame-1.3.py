@@ -1,24 +1,63 @@
+import time
+
+STARTUP_TIME = time.perf_counter()  # --startup-profile times count from here
+
 import pygame
-import random
+import argparse
 import json
 import os
+import random
+import socket
+import threading
+
+from snakegame.config import BOARD_SIZE, UP, DOWN, LEFT, RIGHT, SNAKE_COLORS, BACKGROUND_COLOR, GRID_COLOR
+from snakegame.config import MAX_BOARD_SIZE, MIN_BOARD_SIZE, MOVES, TICK_RATES
+from snakegame.config import POWER_UPS, SLOW_FACTOR, SWARM_DENSITY
+from snakegame.arena import ARENA_BOARD_SIZE, ArenaView, FrameReader
+from snakegame.autopilot import AutopilotPolicy
+from snakegame.game import GameState, InputBuffer
+from snakegame.persistence import AsyncSaver
+from snakegame.profiler import FrameProfiler
+from snakegame.replay import Replay, ReplayPlayer, ReplayRecorder
+from snakegame.render import make_renderer
+from snakegame.selfplay import DEATH_CAUSES
+from snakegame import snapshot
+from snakegame.skins import get_registry
+from snakegame.sprites import SpriteAtlas
+from snakegame.stats import StatsStore
+from snakegame.swarm import SwarmState
+from snakegame.text import get_font, render_text
+try:
+    from snakegame.heatmap import LAYERS, HeatmapStore, combine
+except ImportError:  # NumPy isn't installed; everything but the heatmaps still works
+    HeatmapStore = None
 
 # Constants
-BOARD_SIZE = 20
 CELL_SIZE = 30
-SCREEN_SIZE = BOARD_SIZE * CELL_SIZE
-APPLE_COLOR = (255, 0, 0)  # Red
-BACKGROUND_COLOR = (0, 0, 0)  # Black
+WINDOW_SIZE = 600  # Largest board view; bigger boards scroll with the snake
+# The menus are laid out for a 600 pixel window: the widest line, 'Choose
+# Snake Color (Press C)', is 549 pixels and the color grid reaches x=530. The
+# window never gets smaller, a smaller board is letterboxed in the middle.
+MENU_SIZE = 600
+BOARD_PIXELS = min(BOARD_SIZE * CELL_SIZE, WINDOW_SIZE)  # Side of the board view
+SCREEN_SIZE = max(BOARD_PIXELS, MENU_SIZE)
 GAME_OVER_COLOR = (255, 255, 255)  # White
-GRID_COLOR = (200, 200, 200)  # Light grey
-SNAKE_START_LENGTH = 3
-INITIAL_DIRECTION = (1, 0)  # Moving right initially
+DEFAULT_REFRESH_RATE = 60  # Frames per second when the display doesn't report one
+MAX_FRAME_TIME = 0.25  # Longer stalls are not caught up on tick by tick
+OVERLAY_COLOR = (255, 255, 0)  # Yellow
+OVERLAY_INTERVAL = 0.25  # Seconds between profiler overlay refreshes
+REPLAY_DIR = 'replays'
+SNAPSHOT_PATH = 'suspended.snks'  # The game left running when the window was closed
+MENU_SPACING = 40
+STATS_PATH = 'stats.db'
+RECENT_GAMES = 10  # Games in the statistics screen trend
+HEATMAP_DIR = 'heatmaps'
+HEATMAP_TITLES = {'visits': 'Where the head went', 'apples': 'Where apples were eaten',
+                  'deaths': 'Where the snake bit itself'}
+REPLAY_SEEK_SECONDS = 5
+ARENA_MIN_CELL_SIZE = 6  # Arena boards that would need smaller cells scroll instead
 
 # Directions
-UP = (0, -1)
-DOWN = (0, 1)
-LEFT = (-1, 0)
-RIGHT = (1, 0)
 DIRECTIONS = {
     pygame.K_UP: UP,
     pygame.K_DOWN: DOWN,
@@ -26,32 +65,15 @@ DIRECTIONS = {
     pygame.K_RIGHT: RIGHT
 }
 
-# Define 12 colors for the snake, including green as default
-SNAKE_COLORS = [
-    (0, 255, 0),     # Green (default)
-    (0, 0, 255),     # Blue
-    (255, 255, 0),   # Yellow
-    (255, 165, 0),   # Orange
-    (128, 0, 128),   # Purple
-    (0, 255, 255),   # Cyan
-    (255, 192, 203), # Pink
-    (165, 42, 42),   # Brown
-    (255, 215, 0),   # Gold
-    (0, 128, 128),   # Teal
-    (255, 105, 180), # Hot Pink
-    (64, 224, 208)   # Turquoise
-]
-
-# Special skins unlocked by games played milestones
-SPECIAL_SKINS = {
-    'yellow_hollow': {'type': 'special', 'name': 'Yellow Hollow', 'id': 'yellow_hollow'},
-    'red_hollow': {'type': 'special', 'name': 'Red Hollow', 'id': 'red_hollow'},
-    'purple_hollow': {'type': 'special', 'name': 'Purple Hollow', 'id': 'purple_hollow'}
-}
+# Events that mean a menu has to be painted again
+REDRAW_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED)
 
 # Milestones at every 10 apples up to 100, plus a milestone at 25
 APPLE_MILESTONES = [10, 20, 25, 30, 40, 50, 60, 70, 80, 90, 100]
-GAME_PLAYED_MILESTONES = [5, 10, 15]
+# Built-in skins plus any from skins/*.json; the skins decide the games played milestones
+skins = get_registry()
+GAME_PLAYED_MILESTONES = skins.milestones()
+SWATCH_SIZE = 80
 
 # Initialize variables
 unlocked_colors = []
@@ -62,84 +84,29 @@ current_game_milestones = []
 games_played = 0
 total_apples = 0
 total_deaths = 0
+_milestone_lines = None
+board_size = BOARD_SIZE
+swarm_density = SWARM_DENSITY
 
-def darken_color(color, factor=0.7):
-    return tuple(max(0, min(255, int(c * factor))) for c in color)
-
-def draw_head_with_pattern(screen, color, position):
-    # Get the darker color for the head
-    dark_color = darken_color(color)
-    
-    # Draw the head block with the darker color
-    pygame.draw.rect(
-        screen,
-        dark_color,
-        pygame.Rect(
-            position[0] * CELL_SIZE,
-            position[1] * CELL_SIZE,
-            CELL_SIZE,
-            CELL_SIZE
-        )
-    )
-    
-    # Create a surface for the pattern with transparency support
-    pattern_surface = pygame.Surface((CELL_SIZE, CELL_SIZE), pygame.SRCALPHA)
-    
-    # Define the pattern color (slightly lighter than the head color)
-    pattern_color = (
-        min(255, dark_color[0] + 40),
-        min(255, dark_color[1] + 40),
-        min(255, dark_color[2] + 40)
-    )
-    
-    # Draw the snake-like pattern (e.g., scales)
-    scale_radius = CELL_SIZE // 6
-    for y in range(0, CELL_SIZE, scale_radius * 2):
-        for x in range((y // scale_radius) % 2 * scale_radius, CELL_SIZE, scale_radius * 2):
-            pygame.draw.circle(pattern_surface, pattern_color, (x + scale_radius, y + scale_radius), scale_radius)
-    
-    # Blit the pattern onto the head block
-    screen.blit(pattern_surface, (position[0] * CELL_SIZE, position[1] * CELL_SIZE))
-
-def draw_block(screen, color, position):
-    pygame.draw.rect(
-        screen,
-        color,
-        pygame.Rect(
-            position[0] * CELL_SIZE,
-            position[1] * CELL_SIZE,
-            CELL_SIZE,
-            CELL_SIZE
-        )
-    )
-
-def draw_special_block(screen, skin_id, position):
-    x = position[0] * CELL_SIZE
-    y = position[1] * CELL_SIZE
-    rect = pygame.Rect(x, y, CELL_SIZE, CELL_SIZE)
-    
-    if skin_id == 'yellow_hollow':
-        color = (255, 255, 0)  # Yellow
-    elif skin_id == 'red_hollow':
-        color = (255, 0, 0)  # Red
-    elif skin_id == 'purple_hollow':
-        color = (128, 0, 128)  # Purple
-    else:
-        # Default to white if unknown skin
-        color = (255, 255, 255)
-    
-    # Draw hollow rectangle (only the edges)
-    pygame.draw.rect(screen, color, rect, width=2)
-
-def draw_grid(screen):
-    for x in range(0, SCREEN_SIZE, CELL_SIZE):
-        pygame.draw.line(screen, GRID_COLOR, (x, 0), (x, SCREEN_SIZE))
-    for y in range(0, SCREEN_SIZE, CELL_SIZE):
-        pygame.draw.line(screen, GRID_COLOR, (0, y), (SCREEN_SIZE, y))
+# data.json is written from a background thread, at most once a second
+saver = AsyncSaver('data.json')
+# Per-game history and the lifetime counters, opened by load_data()
+stats = None
+# F3 in game toggles the timing overlay
+profiler = FrameProfiler()
+# load_data() runs on this thread while the first menu frame is drawn
+data_loader = None
+# Startup work the first menu frame doesn't need, stepped by the menu while idle
+startup_steps = None
+# --startup-profile: when each startup stage finished, in seconds since STARTUP_TIME
+startup_marks = None
+# --capture: a FrameCapture that gets every rendered game frame
+frame_capture = None
+# Per board size and mode heatmaps of played games, memory-mapped on first use
+heatmaps = HeatmapStore(HEATMAP_DIR) if HeatmapStore is not None else None
 
 def display_message(screen, message, color, size=30, y_offset=0):
-    font = pygame.font.SysFont(None, size)
-    text = font.render(message, True, color)
+    text = render_text(message, size, color)
     text_rect = text.get_rect(
         center=(SCREEN_SIZE // 2, SCREEN_SIZE // 2 + y_offset)
     )
@@ -147,7 +114,10 @@ def display_message(screen, message, color, size=30, y_offset=0):
 
 def load_data():
     global unlocked_colors, snake_color, milestones_reached, game_played_milestones_reached
-    global total_apples, total_deaths, games_played
+    global total_apples, total_deaths, games_played, stats
+    if stats is None:
+        stats = StatsStore(STATS_PATH)
+    data = {}
     if os.path.exists('data.json'):
         with open('data.json', 'r') as f:
             data = json.load(f)
@@ -169,239 +139,367 @@ def load_data():
             # Load other data
             milestones_reached = data.get('milestones_reached', [])
             game_played_milestones_reached = data.get('game_played_milestones_reached', [])
-            total_apples = data.get('total_apples', 0)
-            total_deaths = data.get('total_deaths', 0)
-            games_played = data.get('games_played', 0)
     else:
         # Default values if data.json doesn't exist
         unlocked_colors = [SNAKE_COLORS[0]]  # Start with green unlocked
         snake_color = SNAKE_COLORS[0]
         milestones_reached = []
         game_played_milestones_reached = []
-        total_apples = 0
-        total_deaths = 0
-        games_played = 0
+    for skin in skins.starters:
+        if skin not in unlocked_colors:
+            unlocked_colors.append(skin)
+    # Older versions kept the counters in data.json, they move to the stats store once
+    stats.migrate_legacy(data)
+    totals = stats.totals()
+    total_apples, total_deaths, games_played = totals.apples, totals.deaths, totals.games
+    if check_game_played_milestones():
+        handle_game_played_milestones()
+
+def load_data_in_background():
+    global data_loader
+
+    def load():
+        load_data()
+        startup_mark('data loaded')
+
+    data_loader = threading.Thread(target=load, name='load-data', daemon=True)
+    data_loader.start()
+
+def wait_for_data():
+    if data_loader is not None:
+        data_loader.join()
+
+def deferred_startup():
+    # Fonts for the other screens, then every skin's sprites, one piece per step
+    for size in (28, 36, 48):
+        get_font(size)
+        yield
+    yield from atlas.prerender_steps()
+    startup_mark('sprites ready')
+
+def startup_mark(stage):
+    if startup_marks is not None and stage not in startup_marks:
+        startup_marks[stage] = time.perf_counter() - STARTUP_TIME
+        print(f'Startup: {stage:<14} {startup_marks[stage] * 1000:8.1f}ms')
 
 def save_data():
     data = {
         'unlocked_colors': [list(color) if isinstance(color, tuple) else color for color in unlocked_colors],
         'snake_color': list(snake_color) if isinstance(snake_color, tuple) else snake_color,
-        'milestones_reached': milestones_reached,
-        'game_played_milestones_reached': game_played_milestones_reached,
-        'total_apples': total_apples,
-        'total_deaths': total_deaths,
-        'games_played': games_played
+        'milestones_reached': list(milestones_reached),
+        'game_played_milestones_reached': list(game_played_milestones_reached)
     }
-    with open('data.json', 'w') as f:
-        json.dump(data, f)
+    saver.save(data)
 
 def mode_selection_screen(screen):
-    global snake_color
+    global snake_color, startup_steps
+    redraw = True
     while True:
-        screen.fill(BACKGROUND_COLOR)
-        font = pygame.font.SysFont(None, 55)
-        easy_text = font.render('Easy Mode (Press E)', True, GAME_OVER_COLOR)
-        easy_rect = easy_text.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE // 2 - 120))
-        
-        medium_text = font.render('Medium Mode (Press M)', True, GAME_OVER_COLOR)
-        medium_rect = medium_text.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE // 2 - 70))
-        
-        color_text = font.render('Choose Snake Color (Press C)', True, GAME_OVER_COLOR)
-        color_rect = color_text.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE // 2 - 20))
-        
-        stats_text = font.render('Statistics (Press S)', True, GAME_OVER_COLOR)
-        stats_rect = stats_text.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE // 2 + 30))
-        
-        quit_text = font.render('Quit (Press Q)', True, GAME_OVER_COLOR)
-        quit_rect = quit_text.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE // 2 + 80))
+        if redraw:
+            screen.fill(BACKGROUND_COLOR)
+            entries = ['Easy Mode (Press E)', 'Medium Mode (Press M)', 'Hard Mode (Press H)',
+                       'Swarm Mode (Press W)', 'Autopilot Demo (Press A)', 'Choose Snake Color (Press C)',
+                       'Statistics (Press S)', 'Quit (Press Q)']
+            resumable = os.path.exists(SNAPSHOT_PATH)
+            if resumable:
+                entries.insert(0, 'Resume Game (Press R)')
+            top = SCREEN_SIZE // 2 - (len(entries) - 1) * MENU_SPACING // 2
+            for row, entry in enumerate(entries):
+                text = render_text(entry, 55, GAME_OVER_COLOR)
+                screen.blit(text, text.get_rect(center=(SCREEN_SIZE // 2, top + row * MENU_SPACING)))
+            pygame.display.flip()
+            startup_mark('first frame')
+            redraw = False
         
-        screen.blit(easy_text, easy_rect)
-        screen.blit(medium_text, medium_rect)
-        screen.blit(color_text, color_rect)
-        screen.blit(stats_text, stats_rect)
-        screen.blit(quit_text, quit_rect)
-        pygame.display.flip()
+        if startup_steps is not None and not pygame.event.peek():
+            try:
+                next(startup_steps)
+            except StopIteration:
+                startup_steps = None
+            continue
         
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
+        # Block until something happens so an idle menu uses no CPU
+        event = pygame.event.wait()
+        if event.type in (pygame.QUIT, pygame.KEYDOWN):
+            wait_for_data()  # Everything past here reads or writes it
+        if event.type == pygame.QUIT:
+            pygame.quit()
+            return None
+        elif event.type in REDRAW_EVENTS:
+            redraw = True
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_e:
+                return 'easy'
+            elif event.key == pygame.K_m:
+                return 'medium'
+            elif event.key == pygame.K_h:
+                return 'hard'
+            elif event.key == pygame.K_w:
+                return 'swarm'
+            elif event.key == pygame.K_a:
+                return 'autopilot'
+            elif event.key == pygame.K_r and resumable:
+                return 'resume'
+            elif event.key == pygame.K_c:
+                choose_color_menu(screen)
+                redraw = True
+            elif event.key == pygame.K_s:
+                statistics_screen(screen)
+                redraw = True
+            elif event.key == pygame.K_q:
                 pygame.quit()
                 return None
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_e:
-                    return 'easy'
-                elif event.key == pygame.K_m:
-                    return 'medium'
-                elif event.key == pygame.K_c:
-                    choose_color_menu(screen)
-                elif event.key == pygame.K_s:
-                    statistics_screen(screen)
-                elif event.key == pygame.K_q:
-                    pygame.quit()
-                    return None
 
-def statistics_screen(screen):
-    running = True
-    while running:
-        screen.fill(BACKGROUND_COLOR)
-        font_title = pygame.font.SysFont(None, 48)
-        font = pygame.font.SysFont(None, 28)
-        title_text = font_title.render('Statistics', True, GAME_OVER_COLOR)
-        title_rect = title_text.get_rect(center=(SCREEN_SIZE // 2, 50))
-        screen.blit(title_text, title_rect)
-        
-        # Prepare milestones text
+def milestone_lines():
+    # The milestones never change, so they are word-wrapped only once
+    global _milestone_lines
+    if _milestone_lines is None:
         milestones_str = ", ".join(map(str, APPLE_MILESTONES))
-        milestones_lines = []
+        _milestone_lines = []
         max_line_width = SCREEN_SIZE - 40  # Margin of 20 pixels on each side
         words = milestones_str.split(', ')
         line = 'Apple Milestones for new colors: '
         for word in words:
             test_line = f"{line}{word}, "
-            if font.size(test_line)[0] < max_line_width:
+            if get_font(28).size(test_line)[0] < max_line_width:
                 line = test_line
             else:
-                milestones_lines.append(line.rstrip(', '))
+                _milestone_lines.append(line.rstrip(', '))
                 line = f"{word}, "
-        milestones_lines.append(line.rstrip(', '))
+        _milestone_lines.append(line.rstrip(', '))
+    return _milestone_lines
+
+def statistics_screen(screen):
+    running = True
+    redraw = True
+    while running:
+        if redraw:
+            screen.fill(BACKGROUND_COLOR)
+            title_text = render_text('Statistics', 48, GAME_OVER_COLOR)
+            title_rect = title_text.get_rect(center=(SCREEN_SIZE // 2, 50))
+            screen.blit(title_text, title_rect)
         
-        # Display apple milestones
-        y = 100
-        for line in milestones_lines:
-            line_text = font.render(line, True, GAME_OVER_COLOR)
-            line_rect = line_text.get_rect(center=(SCREEN_SIZE // 2, y))
-            screen.blit(line_text, line_rect)
-            y += 30  # Adjust spacing between lines
+            # Display apple milestones
+            y = 100
+            for line in milestone_lines():
+                line_text = render_text(line, 28, GAME_OVER_COLOR)
+                line_rect = line_text.get_rect(center=(SCREEN_SIZE // 2, y))
+                screen.blit(line_text, line_rect)
+                y += 30  # Adjust spacing between lines
         
-        # Display game milestones
-        game_milestones_str = ", ".join(map(str, GAME_PLAYED_MILESTONES))
-        game_milestones_text = f"Game Milestones for new skins: {game_milestones_str}"
-        game_milestones_render = font.render(game_milestones_text, True, GAME_OVER_COLOR)
-        game_milestones_rect = game_milestones_render.get_rect(center=(SCREEN_SIZE // 2, y))
-        screen.blit(game_milestones_render, game_milestones_rect)
-        y += 40
+            # Display game milestones
+            game_milestones_str = ", ".join(map(str, GAME_PLAYED_MILESTONES))
+            game_milestones_text = f"Game Milestones for new skins: {game_milestones_str}"
+            game_milestones_render = render_text(game_milestones_text, 28, GAME_OVER_COLOR)
+            game_milestones_rect = game_milestones_render.get_rect(center=(SCREEN_SIZE // 2, y))
+            screen.blit(game_milestones_render, game_milestones_rect)
+            y += 40
         
-        # Display total deaths, apples collected, and games played
-        deaths_text = font.render(f'Total Deaths: {total_deaths}', True, GAME_OVER_COLOR)
-        deaths_rect = deaths_text.get_rect(center=(SCREEN_SIZE // 2, y))
-        screen.blit(deaths_text, deaths_rect)
+            # Display total deaths, apples collected, and games played
+            deaths_text = render_text(f'Total Deaths: {total_deaths}', 28, GAME_OVER_COLOR)
+            deaths_rect = deaths_text.get_rect(center=(SCREEN_SIZE // 2, y))
+            screen.blit(deaths_text, deaths_rect)
         
-        y += 30
-        apples_text = font.render(f'Total Apples Collected: {total_apples}', True, GAME_OVER_COLOR)
-        apples_rect = apples_text.get_rect(center=(SCREEN_SIZE // 2, y))
-        screen.blit(apples_text, apples_rect)
+            y += 30
+            apples_text = render_text(f'Total Apples Collected: {total_apples}', 28, GAME_OVER_COLOR)
+            apples_rect = apples_text.get_rect(center=(SCREEN_SIZE // 2, y))
+            screen.blit(apples_text, apples_rect)
         
-        y += 30
-        games_played_text = font.render(f'Games Played: {games_played}', True, GAME_OVER_COLOR)
-        games_played_rect = games_played_text.get_rect(center=(SCREEN_SIZE // 2, y))
-        screen.blit(games_played_text, games_played_rect)
+            y += 30
+            games_played_text = render_text(f'Games Played: {games_played}', 28, GAME_OVER_COLOR)
+            games_played_rect = games_played_text.get_rect(center=(SCREEN_SIZE // 2, y))
+            screen.blit(games_played_text, games_played_rect)
         
-        instructions_text = font.render('Press any key to return', True, GAME_OVER_COLOR)
-        instructions_rect = instructions_text.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE - 50))
-        screen.blit(instructions_text, instructions_rect)
-        pygame.display.flip()
+            # Best, averages and the last few games, all from running totals
+            totals = stats.totals()
+            average = totals.apples / totals.games if totals.games else 0
+            y += 30
+            best_text = render_text(f'Best Game: {totals.best} apples, Average: {average:.1f}', 28, GAME_OVER_COLOR)
+            best_rect = best_text.get_rect(center=(SCREEN_SIZE // 2, y))
+            screen.blit(best_text, best_rect)
         
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                exit()
-            elif event.type == pygame.KEYDOWN:
+            recent = stats.recent(RECENT_GAMES)
+            if recent:
+                y += 30
+                recent_average = sum(recent) / len(recent)
+                trend = '+' if recent_average >= average else '-'
+                recent_text = render_text(f'Last {len(recent)} Games: avg {recent_average:.1f} '
+                                          f'({trend}{abs(recent_average - average):.1f}), best {max(recent)}',
+                                          28, GAME_OVER_COLOR)
+                recent_rect = recent_text.get_rect(center=(SCREEN_SIZE // 2, y))
+                screen.blit(recent_text, recent_rect)
+        
+            instructions = 'Press H for heatmaps, any other key to return' if heatmaps else 'Press any key to return'
+            instructions_text = render_text(instructions, 28, GAME_OVER_COLOR)
+            instructions_rect = instructions_text.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE - 50))
+            screen.blit(instructions_text, instructions_rect)
+            pygame.display.flip()
+            redraw = False
+        
+        # Block until something happens so an idle menu uses no CPU
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            pygame.quit()
+            exit()
+        elif event.type in REDRAW_EVENTS:
+            redraw = True
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_h and heatmaps:
+                heatmap_screen(screen)
+                redraw = True
+            else:
                 running = False
 
+def heatmap_screen(screen):
+    # One heatmap of this board size at a time: LEFT/RIGHT pick the mode (or
+    # all of them added up), UP/DOWN what it shows, any other key goes back
+    modes = heatmaps.modes(board_size)
+    if len(modes) > 1:
+        modes.insert(0, 'all')
+    mode_index = 0
+    layer_index = 0
+    redraw = True
+    while True:
+        if redraw:
+            screen.fill(BACKGROUND_COLOR)
+            title_text = render_text(f'Heatmaps ({board_size}x{board_size})', 48, GAME_OVER_COLOR)
+            screen.blit(title_text, title_text.get_rect(center=(SCREEN_SIZE // 2, 35)))
+            if modes:
+                mode = modes[mode_index]
+                layer = LAYERS[layer_index]
+                if mode == 'all':
+                    heatmap = combine(heatmaps.get(board_size, m) for m in modes[1:])
+                else:
+                    heatmap = heatmaps.get(board_size, mode)
+                label_text = render_text(f'{mode.title()}: {HEATMAP_TITLES[layer]}', 28, GAME_OVER_COLOR)
+                screen.blit(label_text, label_text.get_rect(center=(SCREEN_SIZE // 2, 75)))
+                width = SCREEN_SIZE - 185
+                rect = screen.blit(heatmap.render(layer, width), ((SCREEN_SIZE - width) // 2, 95))
+                pygame.draw.rect(screen, GRID_COLOR, rect.inflate(2, 2), width=1)
+                counts = heatmap.counts[layer_index]
+                summary_text = render_text(f'{int(counts.sum())} in total, {int(counts.max())} in the busiest cell',
+                                           28, GAME_OVER_COLOR)
+                screen.blit(summary_text, summary_text.get_rect(center=(SCREEN_SIZE // 2, 95 + width + 20)))
+            else:
+                display_message(screen, 'No games on this board size yet', GAME_OVER_COLOR)
+            instructions_text = render_text('LEFT/RIGHT: mode, UP/DOWN: map, other keys: back', 28, GAME_OVER_COLOR)
+            screen.blit(instructions_text, instructions_text.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE - 25)))
+            pygame.display.flip()
+            redraw = False
+
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            pygame.quit()
+            exit()
+        elif event.type in REDRAW_EVENTS:
+            redraw = True
+        elif event.type == pygame.KEYDOWN:
+            if event.key in (pygame.K_LEFT, pygame.K_RIGHT) and modes:
+                step = 1 if event.key == pygame.K_RIGHT else -1
+                mode_index = (mode_index + step) % len(modes)
+                redraw = True
+            elif event.key in (pygame.K_UP, pygame.K_DOWN):
+                step = 1 if event.key == pygame.K_DOWN else -1
+                layer_index = (layer_index + step) % len(LAYERS)
+                redraw = True
+            else:
+                return
+
 def choose_color_menu(screen):
     global snake_color
+    redraw = True
     while True:
-        screen.fill(BACKGROUND_COLOR)
-        font = pygame.font.SysFont(None, 36)
-        title_text = font.render('Choose Your Snake Color', True, GAME_OVER_COLOR)
-        title_rect = title_text.get_rect(center=(SCREEN_SIZE // 2, 50))
-        screen.blit(title_text, title_rect)
+        if redraw:
+            screen.fill(BACKGROUND_COLOR)
+            title_text = render_text('Choose Your Snake Color', 36, GAME_OVER_COLOR)
+            title_rect = title_text.get_rect(center=(SCREEN_SIZE // 2, 50))
+            screen.blit(title_text, title_rect)
         
-        # Display unlocked colors and skins
-        for idx, color in enumerate(unlocked_colors):
-            x = 50 + (idx % 5) * 100
-            y = 100 + (idx // 5) * 100
-            color_rect = pygame.Rect(x, y, 80, 80)
-            if isinstance(color, tuple):
-                # Regular color
-                pygame.draw.rect(screen, color, color_rect)
-            elif isinstance(color, str) and color in SPECIAL_SKINS:
-                # Special skin
-                skin_id = color
-                if skin_id == 'yellow_hollow':
-                    pygame.draw.rect(screen, (255, 255, 0), color_rect, width=5)
-                elif skin_id == 'red_hollow':
-                    pygame.draw.rect(screen, (255, 0, 0), color_rect, width=5)
-                elif skin_id == 'purple_hollow':
-                    pygame.draw.rect(screen, (128, 0, 128), color_rect, width=5)
-                # You can add labels or icons to indicate special skins
-            else:
-                # Unknown, draw as black
-                pygame.draw.rect(screen, (0, 0, 0), color_rect)
-            if idx < 9:
-                label = str(idx + 1)
-            else:
-                label = chr(ord('A') + idx - 9)
-            number_text = font.render(label, True, GAME_OVER_COLOR)
-            number_rect = number_text.get_rect(center=color_rect.center)
-            screen.blit(number_text, number_rect)
+            # Display unlocked colors and skins
+            for idx, color in enumerate(unlocked_colors):
+                x = 50 + (idx % 5) * 100
+                y = 100 + (idx // 5) * 100
+                color_rect = pygame.Rect(x, y, SWATCH_SIZE, SWATCH_SIZE)
+                # The skin's own body tile blown up, so any skin style shows as it plays
+                swatch = pygame.transform.scale(atlas.get(color, 'body'), color_rect.size)
+                screen.blit(swatch, color_rect)
+                if idx < 9:
+                    label = str(idx + 1)
+                else:
+                    label = chr(ord('A') + idx - 9)
+                number_text = render_text(label, 36, GAME_OVER_COLOR)
+                number_rect = number_text.get_rect(center=color_rect.center)
+                screen.blit(number_text, number_rect)
         
-        instructions_text = font.render('Press key to select color or ESC to go back', True, GAME_OVER_COLOR)
-        instructions_rect = instructions_text.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE - 50))
-        screen.blit(instructions_text, instructions_rect)
-        pygame.display.flip()
+            instructions_text = render_text('Press key to select color or ESC to go back', 36, GAME_OVER_COLOR)
+            instructions_rect = instructions_text.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE - 50))
+            screen.blit(instructions_text, instructions_rect)
+            pygame.display.flip()
+            redraw = False
         
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                exit()
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    return  # Exit the color menu
-                choice = None
-                if pygame.K_1 <= event.key <= pygame.K_9:
-                    choice = event.key - pygame.K_1
-                elif pygame.K_a <= event.key <= pygame.K_z:
-                    choice = event.key - pygame.K_a + 9
-                if choice is not None and 0 <= choice < len(unlocked_colors):
-                    snake_color = unlocked_colors[choice]
-                    # Ensure snake_color is the correct type
-                    if isinstance(snake_color, list):
-                        snake_color = tuple(snake_color)
-                    save_data()
-                    return
+        # Block until something happens so an idle menu uses no CPU
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            pygame.quit()
+            exit()
+        elif event.type in REDRAW_EVENTS:
+            redraw = True
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                return  # Exit the color menu
+            choice = None
+            if pygame.K_1 <= event.key <= pygame.K_9:
+                choice = event.key - pygame.K_1
+            elif pygame.K_a <= event.key <= pygame.K_z:
+                choice = event.key - pygame.K_a + 9
+            if choice is not None and 0 <= choice < len(unlocked_colors):
+                snake_color = unlocked_colors[choice]
+                # Ensure snake_color is the correct type
+                if isinstance(snake_color, list):
+                    snake_color = tuple(snake_color)
+                save_data()
+                return
 
-def game_over_screen(screen):
-    global total_deaths, games_played
-    total_deaths += 1
-    games_played += 1
-    save_data()
-    # Check for game played milestones
-    check_game_played_milestones()
-    handle_game_played_milestones()
+def game_over_screen(screen, cleared=False, counted=True):
+    # Autopilot games don't count towards the unlocks
+    if counted:
+        # Check for game played milestones
+        check_game_played_milestones()
+        handle_game_played_milestones()
+    redraw = True
     while True:
-        screen.fill(BACKGROUND_COLOR)
-        font = pygame.font.SysFont(None, 30)
-        display_message(screen, 'Uh oh, can\'t eat yourself', GAME_OVER_COLOR, y_offset=-60)
-        display_message(screen, 'Press R to Retry, M for Main Menu,', GAME_OVER_COLOR, y_offset=-20)
-        display_message(screen, 'C to Choose Color, or Q to Quit', GAME_OVER_COLOR, y_offset=20)
-        pygame.display.flip()
+        if redraw:
+            screen.fill(BACKGROUND_COLOR)
+            if cleared:
+                display_message(screen, 'Board cleared, you win!', GAME_OVER_COLOR, y_offset=-60)
+            else:
+                display_message(screen, 'Uh oh, can\'t eat yourself', GAME_OVER_COLOR, y_offset=-60)
+            display_message(screen, 'Press R to Retry, M for Main Menu,', GAME_OVER_COLOR, y_offset=-20)
+            display_message(screen, 'C to Choose Color, or Q to Quit', GAME_OVER_COLOR, y_offset=20)
+            pygame.display.flip()
+            redraw = False
         
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
+        # Block until something happens so an idle menu uses no CPU
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            pygame.quit()
+            return 'quit'
+        elif event.type in REDRAW_EVENTS:
+            redraw = True
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_r:
+                return 'retry'
+            elif event.key == pygame.K_m:
+                return 'menu'
+            elif event.key == pygame.K_c:
+                choose_color_menu(screen)
+                redraw = True
+            elif event.key == pygame.K_q:
                 pygame.quit()
                 return 'quit'
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_r:
-                    return 'retry'
-                elif event.key == pygame.K_m:
-                    return 'menu'
-                elif event.key == pygame.K_c:
-                    choose_color_menu(screen)
-                elif event.key == pygame.K_q:
-                    pygame.quit()
-                    return 'quit'
 
 def check_milestones():
+    apple_count = game.apple_count
     if (apple_count in APPLE_MILESTONES and
         apple_count not in milestones_reached and
         apple_count not in current_game_milestones):
@@ -417,26 +515,18 @@ def handle_new_milestones():
         save_data()
 
 def check_game_played_milestones():
-    if (games_played in GAME_PLAYED_MILESTONES and
-        games_played not in game_played_milestones_reached):
-        game_played_milestones_reached.append(games_played)
+    # Every milestone up to now, so a skin file added later with a milestone
+    # the player is already past still unlocks. Returns True if any was new.
+    new = [m for m in GAME_PLAYED_MILESTONES if m <= games_played and m not in game_played_milestones_reached]
+    game_played_milestones_reached.extend(new)
+    return bool(new)
 
 def handle_game_played_milestones():
     global unlocked_colors
-    new_milestones = [m for m in game_played_milestones_reached if m in GAME_PLAYED_MILESTONES]
-    for milestone in new_milestones:
-        if milestone == 5:
-            # Unlock yellow_hollow skin
-            if 'yellow_hollow' not in unlocked_colors:
-                unlocked_colors.append('yellow_hollow')
-        elif milestone == 10:
-            # Unlock red_hollow skin
-            if 'red_hollow' not in unlocked_colors:
-                unlocked_colors.append('red_hollow')
-        elif milestone == 15:
-            # Unlock purple_hollow skin
-            if 'purple_hollow' not in unlocked_colors:
-                unlocked_colors.append('purple_hollow')
+    for milestone in game_played_milestones_reached:
+        for skin in skins.unlocks.get(milestone, ()):
+            if skin not in unlocked_colors:
+                unlocked_colors.append(skin)
     save_data()
 
 def choose_new_color(screen):
@@ -445,162 +535,547 @@ def choose_new_color(screen):
     if not available_colors:
         return  # All colors unlocked
     
+    redraw = True
     while True:
-        screen.fill(BACKGROUND_COLOR)
-        font = pygame.font.SysFont(None, 36)
-        title_text = font.render('Choose a new Snake Color', True, GAME_OVER_COLOR)
-        title_rect = title_text.get_rect(center=(SCREEN_SIZE // 2, 50))
-        screen.blit(title_text, title_rect)
+        if redraw:
+            screen.fill(BACKGROUND_COLOR)
+            title_text = render_text('Choose a new Snake Color', 36, GAME_OVER_COLOR)
+            title_rect = title_text.get_rect(center=(SCREEN_SIZE // 2, 50))
+            screen.blit(title_text, title_rect)
         
-        # Display available colors
-        for idx, color in enumerate(available_colors):
-            x = 50 + (idx % 5) * 100
-            y = 100 + (idx // 5) * 100
-            color_rect = pygame.Rect(x, y, 80, 80)
-            pygame.draw.rect(screen, color, color_rect)
-            if idx < 9:
-                label = str(idx + 1)
-            else:
-                label = chr(ord('A') + idx - 9)
-            number_text = font.render(label, True, GAME_OVER_COLOR)
-            number_rect = number_text.get_rect(center=color_rect.center)
-            screen.blit(number_text, number_rect)
+            # Display available colors
+            for idx, color in enumerate(available_colors):
+                x = 50 + (idx % 5) * 100
+                y = 100 + (idx // 5) * 100
+                color_rect = pygame.Rect(x, y, 80, 80)
+                pygame.draw.rect(screen, color, color_rect)
+                if idx < 9:
+                    label = str(idx + 1)
+                else:
+                    label = chr(ord('A') + idx - 9)
+                number_text = render_text(label, 36, GAME_OVER_COLOR)
+                number_rect = number_text.get_rect(center=color_rect.center)
+                screen.blit(number_text, number_rect)
         
-        instructions_text = font.render('Press key to select color', True, GAME_OVER_COLOR)
-        instructions_rect = instructions_text.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE - 50))
-        screen.blit(instructions_text, instructions_rect)
-        pygame.display.flip()
+            instructions_text = render_text('Press key to select color', 36, GAME_OVER_COLOR)
+            instructions_rect = instructions_text.get_rect(center=(SCREEN_SIZE // 2, SCREEN_SIZE - 50))
+            screen.blit(instructions_text, instructions_rect)
+            pygame.display.flip()
+            redraw = False
         
+        # Block until something happens so an idle menu uses no CPU
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            pygame.quit()
+            exit()
+        elif event.type in REDRAW_EVENTS:
+            redraw = True
+        elif event.type == pygame.KEYDOWN:
+            choice = None
+            if pygame.K_1 <= event.key <= pygame.K_9:
+                choice = event.key - pygame.K_1
+            elif pygame.K_a <= event.key <= pygame.K_z:
+                choice = event.key - pygame.K_a + 9
+            if choice is not None and 0 <= choice < len(available_colors):
+                selected_color = available_colors[choice]
+                unlocked_colors.append(selected_color)
+                # Ensure unlocked_colors contains tuples
+                unlocked_colors = [tuple(color) if isinstance(color, list) else color for color in unlocked_colors]
+                save_data()
+                return
+
+def display_refresh_rate():
+    # Older pygame versions and some drivers can't tell, 0 means unknown
+    get_rate = getattr(pygame.display, 'get_current_refresh_rate', None)
+    rate = get_rate() if get_rate else 0
+    return rate or DEFAULT_REFRESH_RATE
+
+def reset_game(mode):
+    global game, recorder, current_game_milestones
+    # Every game gets its own seed so it can be replayed exactly
+    if mode == 'swarm':
+        game = SwarmState(board_size, random.getrandbits(64), swarm_density)
+    else:
+        game = GameState(board_size, random.getrandbits(64))
+    recorder = ReplayRecorder(game, mode)
+    current_game_milestones = []
+    atlas.use_skin(snake_color)
+
+def suspend_game(mode):
+    # Keeps a game that was left running, replay so far included, for the
+    # menu's Resume entry
+    if game.status == 'running':
+        snapshot.save(SNAPSHOT_PATH, game, mode, recorder.replay)
+
+def resume_game():
+    # Picks the suspended game back up and returns its mode, or None if the
+    # snapshot can't be read. Either way the snapshot is used up.
+    global game, recorder, current_game_milestones
+    try:
+        game, mode, replay = snapshot.load(SNAPSHOT_PATH)
+    except (OSError, snapshot.SnapshotError) as error:
+        print(f'Could not resume the suspended game: {error}')
+        return None
+    finally:
+        if os.path.exists(SNAPSHOT_PATH):
+            os.remove(SNAPSHOT_PATH)
+    recorder = ReplayRecorder(game, mode)
+    if replay is not None:
+        recorder.replay = replay
+    # Milestones are only handed out at game over, so any not reached yet were reached in this game
+    current_game_milestones = [m for m in APPLE_MILESTONES
+                               if m <= game.apple_count and m not in milestones_reached]
+    atlas.use_skin(snake_color)
+    return mode
+
+def current_tick_length(mode):
+    # 'slow' in swarm mode stretches the ticks, not the frames
+    tick_length = 1.0 / TICK_RATES[mode]
+    if mode == 'swarm' and game.active('slow'):
+        tick_length *= SLOW_FACTOR
+    return tick_length
+
+def record_game(mode):
+    global total_apples, total_deaths, games_played
+    stats.record_game(mode, game.apple_count, len(game.snake), game.ticks,
+                      game.ticks / TICK_RATES[mode], DEATH_CAUSES[game.status])
+    totals = stats.totals()
+    total_apples, total_deaths, games_played = totals.apples, totals.deaths, totals.games
+
+def save_replay(replay):
+    # Keeps the last game and the best game so far. Replays only re-simulate
+    # single apple games, so swarm games aren't kept.
+    if replay.mode == 'swarm':
+        return
+    os.makedirs(REPLAY_DIR, exist_ok=True)
+    replay.save(os.path.join(REPLAY_DIR, 'last.snkr'))
+    best_path = os.path.join(REPLAY_DIR, 'best.snkr')
+    try:
+        best = Replay.load(best_path).apple_count
+    except (OSError, ValueError):
+        best = -1
+    if replay.apple_count > best and replay.mode != 'autopilot':
+        replay.save(best_path)
+
+def init_display():
+    # Display and fonts are all the game uses; pygame.init() would also bring
+    # up audio, joysticks and the rest
+    pygame.display.init()
+    pygame.font.init()
+
+def open_window(size=None):
+    # Sprites are drawn the first time they are used, main() has the menu
+    # draw the rest while it waits for input
+    global screen, board_screen, atlas, BOARD_PIXELS, SCREEN_SIZE
+    if size is not None:
+        BOARD_PIXELS = min(size * CELL_SIZE, WINDOW_SIZE)
+        SCREEN_SIZE = max(BOARD_PIXELS, MENU_SIZE)
+    init_display()
+    screen = pygame.display.set_mode((SCREEN_SIZE, SCREEN_SIZE))
+    pygame.display.set_caption("Snake Game")
+    # The part of the window the board is drawn in, centred
+    margin = (SCREEN_SIZE - BOARD_PIXELS) // 2
+    board_screen = screen.subsurface((margin, margin, BOARD_PIXELS, BOARD_PIXELS))
+    atlas = SpriteAtlas(CELL_SIZE)
+    return screen
+
+def clear_window():
+    # Wipes the last menu before a game is drawn; a letterboxed board gets a
+    # frame so the wraparound edges can be seen
+    screen.fill(BACKGROUND_COLOR)
+    if BOARD_PIXELS < SCREEN_SIZE:
+        margin = (SCREEN_SIZE - BOARD_PIXELS) // 2
+        pygame.draw.rect(screen, GRID_COLOR, (margin - 1, margin - 1, BOARD_PIXELS + 2, BOARD_PIXELS + 2), width=1)
+
+def watch_replay(path, full_redraw=False):
+    # Plays a recorded game back at its original speed. LEFT/RIGHT seek,
+    # ESC or Q quits.
+    replay = Replay.load(path)
+    open_window(replay.board_size)
+    load_data()  # For the selected snake color
+    atlas.use_skin(snake_color)
+    clear_window()
+    clock = pygame.time.Clock()
+    refresh_rate = display_refresh_rate()
+    player = ReplayPlayer(replay)
+    renderer = make_renderer(board_screen, atlas, replay.board_size, CELL_SIZE, grid=(replay.mode == 'easy'),
+                             full_redraw=full_redraw)
+    tick_rate = TICK_RATES.get(replay.mode, TICK_RATES['medium'])
+    tick_length = 1.0 / tick_rate
+    accumulator = 0.0
+    previous_time = time.perf_counter()
+    
+    while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
-                exit()
+                return
             elif event.type == pygame.KEYDOWN:
-                choice = None
-                if pygame.K_1 <= event.key <= pygame.K_9:
-                    choice = event.key - pygame.K_1
-                elif pygame.K_a <= event.key <= pygame.K_z:
-                    choice = event.key - pygame.K_a + 9
-                if choice is not None and 0 <= choice < len(available_colors):
-                    selected_color = available_colors[choice]
-                    unlocked_colors.append(selected_color)
-                    # Ensure unlocked_colors contains tuples
-                    unlocked_colors = [tuple(color) if isinstance(color, list) else color for color in unlocked_colors]
-                    save_data()
+                if event.key in (pygame.K_ESCAPE, pygame.K_q):
+                    pygame.quit()
                     return
+                elif event.key == pygame.K_RIGHT:
+                    player.seek(player.state.ticks + tick_rate * REPLAY_SEEK_SECONDS)
+                    accumulator = 0.0
+                elif event.key == pygame.K_LEFT:
+                    player.seek(max(0, player.state.ticks - tick_rate * REPLAY_SEEK_SECONDS))
+                    accumulator = 0.0
+        
+        now = time.perf_counter()
+        accumulator += min(now - previous_time, MAX_FRAME_TIME)
+        previous_time = now
+        while accumulator >= tick_length and not player.finished:
+            accumulator -= tick_length
+            player.step()
+        
+        state = player.state
+        alpha = 1.0 if player.finished else accumulator / tick_length
+        hud_text = render_text(f'Replay: {state.apple_count} apples, tick {state.ticks}/{replay.ticks}',
+                               36, (255, 255, 255))
+        renderer.draw(state, [(hud_text, (10, 10))], alpha)
+        if frame_capture is not None:
+            frame_capture.grab(screen)
+        clock.tick(refresh_rate)
 
-def reset_game():
-    global snake, direction, apple, apple_count, current_game_milestones
-    snake = [(10, 10), (9, 10), (8, 10)]
-    direction = INITIAL_DIRECTION
-    apple = generate_new_apple()
-    apple_count = 0
-    current_game_milestones = []
+def run_arena_server(port, size):
+    # Hosts an arena until interrupted, then prints the tick statistics
+    import asyncio
+    from snakegame.arena import Arena
+    from snakegame.arena_server import serve
 
-def generate_new_apple():
-    while True:
-        new_apple = (
-            random.randint(0, BOARD_SIZE - 1),
-            random.randint(0, BOARD_SIZE - 1)
-        )
-        if new_apple not in snake:
-            return new_apple
-
-def main():
-    global snake, direction, apple, apple_count, screen, total_apples  # Ensure global access
-    pygame.init()
-    screen = pygame.display.set_mode((SCREEN_SIZE, SCREEN_SIZE))
-    pygame.display.set_caption("Snake Game")
+    async def run():
+        arena_server, server = await serve('0.0.0.0', port, Arena(size))
+        print(f'Arena server on port {server.sockets[0].getsockname()[1]}, '
+              f'{size}x{size} board, {arena_server.tick_rate} ticks/sec')
+        async with server:
+            try:
+                await arena_server.run()
+            finally:
+                for line in arena_server.report():
+                    print(line)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+def play_arena(address):
+    # Joins an arena server. Arrows steer, ESC or Q leaves. The server owns the
+    # game, this only draws its copy of the board and sends direction changes.
+    host, _, port = address.rpartition(':')
+    connection = socket.create_connection((host or '127.0.0.1', int(port)))
+    frames = FrameReader()
+    view = ArenaView()
+    while view.player_id is None:
+        data = connection.recv(65536)
+        if not data:
+            return
+        for payload in frames.feed(data):
+            view.apply(payload)
+    connection.setblocking(False)
+
+    load_data()  # For the selected snake color
+    size = view.size
+    cell_size = max(ARENA_MIN_CELL_SIZE, min(CELL_SIZE, WINDOW_SIZE // size))
+    screen_size = min(size * cell_size, WINDOW_SIZE)
+    # Boards that don't fit scroll to keep our head in the middle
+    scrolling = size * cell_size > screen_size
+    half = screen_size // cell_size // 2
+    init_display()
+    screen = pygame.display.set_mode((screen_size, screen_size))
+    pygame.display.set_caption("Snake Arena")
+    arena_atlas = SpriteAtlas(cell_size)
     clock = pygame.time.Clock()
+    refresh_rate = display_refresh_rate()
+    origin_x = origin_y = 0  # Top left cell on screen; kept while we wait to respawn
     
-    load_data()  # Load unlocked colors and selected snake color
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                return
+            elif event.type == pygame.KEYDOWN:
+                if event.key in (pygame.K_ESCAPE, pygame.K_q):
+                    pygame.quit()
+                    return
+                elif event.key in DIRECTIONS:
+                    connection.send(bytes([MOVES.index(DIRECTIONS[event.key])]))
+        
+        try:
+            while True:
+                data = connection.recv(65536)
+                if not data:
+                    pygame.quit()
+                    return
+                for payload in frames.feed(data):
+                    view.apply(payload)
+        except BlockingIOError:
+            pass
+        
+        own = view.snakes.get(view.player_id)
+        if scrolling and own:
+            origin_x = own[0] % size - half
+            origin_y = own[0] // size - half
+
+        def position(cell):
+            # Wrapped around the torus; anything off screen is clipped by the blit
+            return (cell % size - origin_x) % size * cell_size, (cell // size - origin_y) % size * cell_size
+
+        screen.fill(BACKGROUND_COLOR)
+        for snake_id, body in view.snakes.items():
+            # Our snake in the chosen color, everyone else in one of the palette colors
+            skin = snake_color if snake_id == view.player_id else SNAKE_COLORS[snake_id % len(SNAKE_COLORS)]
+            sprite = arena_atlas.get(skin, 'body')
+            screen.blits([(sprite, position(cell)) for cell in body], doreturn=False)
+            screen.blit(arena_atlas.get(skin, 'head'), position(body[0]))
+        apple = arena_atlas.get(None, 'apple')
+        screen.blits([(apple, position(cell)) for cell in view.apples], doreturn=False)
+        screen.blit(render_text(f'Length: {len(own) if own else 0}', 36, (255, 255, 255)), (10, 10))
+        pygame.display.flip()
+        clock.tick(refresh_rate)
+
+def profiler_overlay():
+    lines = profiler.summary_lines() + [atlas.report(), saver.report()]
+    font = get_font(20)
+    surfaces = [font.render(line, True, OVERLAY_COLOR) for line in lines]
+    panel = pygame.Surface((max(surface.get_width() for surface in surfaces) + 10,
+                            sum(surface.get_height() for surface in surfaces) + 10))
+    y = 5
+    for surface in surfaces:
+        panel.blit(surface, (5, y))
+        y += surface.get_height()
+    return panel
+
+def main(full_redraw=False, show_profiler=False, trace=False):
+    global startup_steps, board_size
+    if show_profiler:
+        profiler.toggle_overlay()
+    if trace:
+        profiler.start_trace()
+    load_data_in_background()  # Unlocked colors, selected snake color and the stats store
+    screen = open_window(board_size)
+    startup_mark('window open')
+    startup_steps = deferred_startup()
+    clock = pygame.time.Clock()
+    refresh_rate = display_refresh_rate()
+    launch_size = board_size
     
     while True:
+        if board_size != launch_size:
+            # A resumed game from another board size is over, new games use --board-size again
+            board_size = launch_size
+            screen = open_window(board_size)
         mode = mode_selection_screen(screen)
         if mode is None:
             break
         
-        reset_game()
+        if mode == 'resume':
+            mode = resume_game()
+            if mode is None:
+                continue
+            if game.board_size != board_size:
+                board_size = game.board_size
+                screen = open_window(board_size)
+                atlas.use_skin(snake_color)  # The new window came with a new atlas
+        else:
+            reset_game(mode)
+        clear_window()
+        renderer = make_renderer(board_screen, atlas, board_size, CELL_SIZE, grid=(mode == 'easy'),
+                                 full_redraw=full_redraw, profiler=profiler)
+        inputs = InputBuffer()
+        pilot = AutopilotPolicy() if mode == 'autopilot' else None
+        # Autopilot games are left out, like from the statistics
+        heatmap = heatmaps.get(board_size, mode) if heatmaps and not pilot else None
+        tick_length = current_tick_length(mode)
+        hud_state = None
+        accumulator = 0.0
+        previous_time = time.perf_counter()
+        overlay = None
+        overlay_due = 0.0
         running = True
         
         while running:
-            new_direction = direction
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    return
-                elif event.type == pygame.KEYDOWN:
-                    if event.key in DIRECTIONS:
-                        if (DIRECTIONS[event.key][0] + direction[0] != 0) or (
-                            DIRECTIONS[event.key][1] + direction[1] != 0
-                        ):
-                            new_direction = DIRECTIONS[event.key]
+            profiler.begin_frame()
+            with profiler.phase('events'):
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        suspend_game(mode)
+                        pygame.quit()
+                        return
+                    elif event.type == pygame.KEYDOWN:
+                        if event.key in DIRECTIONS:
+                            inputs.push(DIRECTIONS[event.key])
+                        elif event.key == pygame.K_F3:
+                            profiler.toggle_overlay()
+                        elif event.key == pygame.K_q:
+                            suspend_game(mode)
+                            running = False
+            if not running:
+                break  # Back to the main menu, which now offers Resume
             
-            head_x, head_y = snake[0]
-            move_x, move_y = new_direction
-            new_head = (
-                (head_x + move_x) % BOARD_SIZE,
-                (head_y + move_y) % BOARD_SIZE
-            )
-            snake = [new_head] + snake[:-1]
+            # Run as many fixed ticks as the elapsed time allows, rendering is separate
+            now = time.perf_counter()
+            accumulator += min(now - previous_time, MAX_FRAME_TIME)
+            previous_time = now
+            while game.status == 'running':
+                tick_length = current_tick_length(mode)
+                if accumulator < tick_length:
+                    break
+                accumulator -= tick_length
+                with profiler.phase('simulate'):
+                    recorder.step(pilot(game) if pilot else inputs.pop(game))
+                    if heatmap is not None:
+                        heatmap.record(game)
+                
+                if game.ate_apple and not pilot:
+                    check_milestones()
             
-            if new_head in snake[1:]:
+            # 'cleared' means no free cell was left for an apple
+            if game.status != 'running':
+                save_replay(recorder.finish())
+                if not pilot:
+                    record_game(mode)
+                    if heatmap is not None:
+                        heatmap.flush()
                 # Handle new milestones before game over
                 handle_new_milestones()
-                result = game_over_screen(screen)
+                result = game_over_screen(screen, game.status == 'cleared', counted=pilot is None)
                 if result == 'quit':
                     pygame.quit()
                     return
                 elif result == 'retry':
-                    reset_game()
+                    reset_game(mode)
+                    clear_window()
+                    renderer.reset()
+                    inputs.clear()
+                    hud_state = None
+                    accumulator = 0.0
+                    previous_time = time.perf_counter()
                     continue
                 elif result == 'menu':
                     break  # Exit the inner while loop to return to the main menu
             
-            if new_head == apple:
-                snake.append(snake[-1])
-                apple = generate_new_apple()
-                apple_count += 1
-                total_apples += 1
-                check_milestones()
-                save_data()
-            
-            screen.fill(BACKGROUND_COLOR)
-            
-            if mode == 'easy':
-                draw_grid(screen)
-            
-            # Draw the snake
-            for index, segment in enumerate(snake):
-                if index == 0:
-                    if isinstance(snake_color, str) and snake_color in SPECIAL_SKINS:
-                        # Determine the head color based on the skin
-                        if snake_color == 'yellow_hollow':
-                            head_color = (255, 255, 0)  # Yellow
-                        elif snake_color == 'red_hollow':
-                            head_color = darken_color((255, 0, 0), factor=0.6)  # Darker red
-                        elif snake_color == 'purple_hollow':
-                            head_color = (128, 0, 128)  # Purple
-                        else:
-                            head_color = (255, 255, 255)  # Default to white
-                        draw_head_with_pattern(screen, head_color, segment)
-                    else:
-                        draw_head_with_pattern(screen, snake_color, segment)
-                else:
-                    if isinstance(snake_color, str) and snake_color in SPECIAL_SKINS:
-                        draw_special_block(screen, snake_color, segment)
-                    else:
-                        draw_block(screen, snake_color, segment)
-            draw_block(screen, APPLE_COLOR, apple)
-            
-            font = pygame.font.SysFont(None, 36)
-            text = font.render(f'Apples Eaten: {apple_count}', True, (255, 255, 255))
-            screen.blit(text, (10, 10))
-            
-            pygame.display.flip()
-            clock.tick(10)
-            
-            direction = new_direction
+            with profiler.phase('hud'):
+                # The HUD text only changes when an apple is eaten or a power-up starts or ends
+                effects = [name for name in POWER_UPS if game.active(name)] if mode == 'swarm' else []
+                if (game.apple_count, effects) != hud_state:
+                    hud_state = (game.apple_count, effects)
+                    hud = f'Apples Eaten: {game.apple_count}'
+                    if effects:
+                        hud += '  ' + ', '.join(effects).title()
+                    hud_text = render_text(hud, 36, (255, 255, 255))
+                texts = [(hud_text, (10, 10))]
+                if profiler.show_overlay:
+                    if overlay is None or now >= overlay_due:
+                        overlay = profiler_overlay()
+                        overlay_due = now + OVERLAY_INTERVAL
+                    texts.append((overlay, (max(0, BOARD_PIXELS - overlay.get_width() - 10), 10)))
+            renderer.draw(game, texts, accumulator / tick_length)
+            if frame_capture is not None:
+                frame_capture.grab(screen)
+            clock.tick(refresh_rate)
+
+def finish_capture():
+    # Waits for the clip to be written out and prints how capture kept up
+    if frame_capture is not None:
+        for line in frame_capture.close():
+            print(line)
+
+def board_size_arg(value):
+    size = int(value)
+    if not MIN_BOARD_SIZE <= size <= MAX_BOARD_SIZE:
+        raise argparse.ArgumentTypeError(f'board size must be between {MIN_BOARD_SIZE} and {MAX_BOARD_SIZE}')
+    return size
+
+def window_arg(value):
+    size = int(value)
+    if size < MENU_SIZE:
+        raise argparse.ArgumentTypeError(f'window must be at least {MENU_SIZE} pixels for the menus')
+    return size
+
+def density_arg(value):
+    density = float(value)
+    if not 0 < density <= 1:
+        raise argparse.ArgumentTypeError('density must be above 0 and at most 1')
+    return density
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Snake Game')
+    parser.add_argument('--board-size', type=board_size_arg,
+                        help=f'cells per side, up to {MAX_BOARD_SIZE}; boards wider than the window scroll '
+                             f'(default {BOARD_SIZE}, or {ARENA_BOARD_SIZE} with --serve)')
+    parser.add_argument('--window', type=window_arg, default=WINDOW_SIZE,
+                        help=f'largest board view in pixels, at least {MENU_SIZE}')
+    parser.add_argument('--headless', action='store_true',
+                        help='play seeded games without a window and report ticks/sec')
+    parser.add_argument('--games', type=int, help='number of headless games (default 1000, or 1 with --capture)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first headless game')
+    parser.add_argument('--policy', default='random',
+                        help='headless policy: random, greedy, autopilot or module:factory')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='processes for headless games (0 uses every core)')
+    parser.add_argument('--replay', metavar='FILE',
+                        help='watch a recorded game, or verify it at full speed with --headless')
+    parser.add_argument('--full-redraw', action='store_true',
+                        help='repaint the whole board every frame instead of only what changed')
+    parser.add_argument('--profile', action='store_true',
+                        help='start with the frame timing overlay shown (F3 toggles it in game)')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='record game loop phases and write them as a Chrome trace on exit')
+    parser.add_argument('--serve', type=int, metavar='PORT',
+                        help='host a multiplayer arena (0 picks a free port)')
+    parser.add_argument('--connect', metavar='HOST:PORT', help='join a multiplayer arena')
+    parser.add_argument('--snapshot', metavar='FILE',
+                        help=f'with --headless, play every game on from this suspended game ({SNAPSHOT_PATH})')
+    parser.add_argument('--max-ticks', type=int, default=100000, help='tick limit per headless game')
+    parser.add_argument('--swarm-density', type=density_arg, default=SWARM_DENSITY,
+                        help='share of the board covered in apples in swarm mode')
+    parser.add_argument('--heatmaps', action='store_true',
+                        help='with --headless, add the games to the heatmaps on the statistics screen')
+    parser.add_argument('--capture', metavar='FILE',
+                        help='record the game, replay or --headless games as a .gif, or PNGs in a directory')
+    parser.add_argument('--startup-profile', action='store_true',
+                        help='print when each startup stage finished, including the first menu frame')
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.startup_profile:
+        startup_marks = {}
+        startup_mark('imports')
+    board_size = args.board_size or BOARD_SIZE
+    swarm_density = args.swarm_density
+    WINDOW_SIZE = args.window
+    if args.heatmaps and heatmaps is None:
+        raise SystemExit('--heatmaps needs NumPy (pip install numpy)')
+    if args.capture:
+        from snakegame.capture import FrameCapture, record
+        if not args.headless:
+            frame_capture = FrameCapture(args.capture)
+    if args.headless and args.capture:
+        record(args.capture, args.games or 1, args.seed, args.policy, board_size, args.max_ticks, CELL_SIZE,
+               WINDOW_SIZE)
+    elif args.headless and args.replay:
+        from snakegame import headless
+        headless.check_replay(args.replay)
+    elif args.headless:
+        from snakegame import headless
+        headless.run(args.games or 1000, args.seed, args.policy, args.workers or None,
+                     board_size=board_size, max_ticks=args.max_ticks, snapshot=args.snapshot,
+                     heatmaps=heatmaps if args.heatmaps else None)
+    elif args.serve is not None:
+        run_arena_server(args.serve, args.board_size or ARENA_BOARD_SIZE)
+    elif args.connect:
+        play_arena(args.connect)
+    elif args.replay:
+        try:
+            watch_replay(args.replay, full_redraw=args.full_redraw)
+        finally:
+            finish_capture()
+    else:
+        try:
+            main(full_redraw=args.full_redraw, show_profiler=args.profile, trace=bool(args.trace))
+        finally:
+            if args.trace:
+                profiler.dump_trace(args.trace)
+            finish_capture()
@@ -0,0 +1,89 @@
+# Load test for the arena server: starts a server in its own process,
+# connects hundreds of localhost bots and reports the server's tick jitter
+# and tick cost, plus the tick spacing one bot actually saw.
+#
+#   python benchmarks/arena_load.py [--bots 300] [--mirror-bots 20] [--seconds 10]
+#                                   [--board-size 128] [--tick-rate 10]
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from snakegame.arena import Arena, FrameReader  # noqa: E402
+from snakegame.arena_server import run_bot, serve  # noqa: E402
+
+
+def server_process(port_queue, result_queue, board_size, apples, tick_rate, seconds):
+    async def main():
+        arena_server, server = await serve('127.0.0.1', 0, Arena(board_size, apples, seed=0), tick_rate)
+        port_queue.put(server.sockets[0].getsockname()[1])
+        async with server:
+            await arena_server.run(seconds)
+        result_queue.put(arena_server.report())
+
+    asyncio.run(main())
+
+
+async def probe(host, port, seconds):
+    # Records when each tick arrives at a client
+    reader, writer = await asyncio.open_connection(host, port)
+    loop = asyncio.get_running_loop()
+    frames = FrameReader()
+    arrivals = []
+    end = loop.time() + seconds
+    while loop.time() < end:
+        data = await reader.read(65536)
+        if not data:
+            break
+        now = loop.time()
+        arrivals.extend(now for _ in frames.feed(data))
+    writer.close()
+    return arrivals
+
+
+async def run_clients(port, bots, mirror_bots, seconds):
+    tasks = [asyncio.create_task(run_bot('127.0.0.1', port, seed=i, mirror=i < mirror_bots))
+             for i in range(bots)]
+    arrivals = await probe('127.0.0.1', port, seconds)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return arrivals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Arena server load test')
+    parser.add_argument('--bots', type=int, default=300)
+    parser.add_argument('--mirror-bots', type=int, default=20,
+                        help='bots that decode every tick and steer; the rest turn at random')
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--board-size', type=int, default=128)
+    parser.add_argument('--apples', type=int, default=64)
+    parser.add_argument('--tick-rate', type=int, default=10)
+    args = parser.parse_args()
+
+    port_queue = multiprocessing.Queue()
+    result_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=server_process, args=(
+        port_queue, result_queue, args.board_size, args.apples, args.tick_rate, args.seconds + 1.0))
+    server.start()
+    port = port_queue.get()
+    arrivals = asyncio.run(run_clients(port, args.bots, args.mirror_bots, args.seconds))
+    lines = result_queue.get()
+    server.join()
+
+    print(f'{args.bots} bots ({args.mirror_bots} mirroring), {args.board_size}x{args.board_size} board')
+    for line in lines:
+        print(line)
+    gaps = sorted(b - a for a, b in zip(arrivals, arrivals[1:]))
+    if gaps:
+        expected = 1000.0 / args.tick_rate
+        print(f'Client tick spacing (expected {expected:.1f}ms): p1 {gaps[len(gaps) // 100] * 1000:.2f}ms  '
+              f'p50 {gaps[len(gaps) // 2] * 1000:.2f}ms  p99 {gaps[len(gaps) * 99 // 100] * 1000:.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
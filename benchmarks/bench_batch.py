@@ -0,0 +1,49 @@
+# Steps/sec of BatchSnakeEnv for a range of batch sizes, after checking the
+# batch rules against the scalar GameState.
+#
+#   python benchmarks/bench_batch.py [--board-size 20] [--steps 200]
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from snakegame.batch import BatchSnakeEnv, RUNNING, verify_against_scalar  # noqa: E402
+from snakegame.policies import MOVES  # noqa: E402
+
+BATCH_SIZES = [1, 16, 256, 1024, 4096]
+
+
+def bench(num_boards, board_size, steps, seed=0):
+    rng = np.random.default_rng(seed)
+    env = BatchSnakeEnv(num_boards, board_size, seed)
+    actions = rng.integers(-1, len(MOVES), (steps, num_boards))
+    start = time.perf_counter()
+    for tick in range(steps):
+        env.step(actions[tick])
+        done = np.flatnonzero(env.status != RUNNING)
+        if done.size:
+            env.reset(done)
+    elapsed = time.perf_counter() - start
+    return num_boards * steps / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BatchSnakeEnv benchmark')
+    parser.add_argument('--board-size', type=int, default=20)
+    parser.add_argument('--steps', type=int, default=200)
+    args = parser.parse_args()
+
+    verify_against_scalar()
+    print('Batch rules match the scalar engine')
+    print(f'{"boards":>8} {"board steps/sec":>18}')
+    for num_boards in BATCH_SIZES:
+        rate = bench(num_boards, args.board_size, args.steps)
+        print(f'{num_boards:>8} {rate:>18,.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,354 @@
+# Benchmarks for the simulation, rendering and persistence hot paths. Results
+# go to a JSON file; pass an earlier file with --compare to see the change.
+# Rendering runs on offscreen surfaces under SDL's dummy video driver.
+#
+#   python benchmarks/bench_suite.py [--output bench.json] [--compare old.json]
+#                                    [--quick] [--only NAME ...]
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import pygame  # noqa: E402
+
+from snakegame.autopilot import cycle_direction  # noqa: E402
+from snakegame.config import SNAKE_COLORS  # noqa: E402
+from snakegame.engine import Snake  # noqa: E402
+from snakegame.game import GameState  # noqa: E402
+from snakegame.persistence import AsyncSaver, write_json_atomic  # noqa: E402
+from snakegame.render import BoardRenderer, ViewportRenderer  # noqa: E402
+from snakegame.snapshot import dumps, loads  # noqa: E402
+from snakegame.sprites import SpriteAtlas, draw_head_with_pattern  # noqa: E402
+from snakegame.swarm import SwarmState  # noqa: E402
+
+BOARD_SIZE = 20
+CELL_SIZE = 30
+LENGTHS = {'3': 3, '100': 100, 'full': BOARD_SIZE * BOARD_SIZE}
+
+
+def measure(func, number, repeat):
+    # Median seconds per call over `repeat` runs of `number` calls
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        runs.append((time.perf_counter() - start) / number)
+    return statistics.median(runs)
+
+
+def cycle_snake(board_size, length):
+    # A snake laid along the autopilot's Hamiltonian cycle, so moving it along
+    # the cycle never collides, even when it fills the whole board
+    cells = [0]
+    while len(cells) < length:
+        y, x = divmod(cells[-1], board_size)
+        direction = cycle_direction(cells[-1], board_size)
+        cells.append((y + direction[1]) % board_size * board_size + (x + direction[0]) % board_size)
+    segments = [(cell % board_size, cell // board_size) for cell in reversed(cells)]
+    return Snake(board_size, segments)
+
+
+def cycle_game(board_size, length, seed=0):
+    game = GameState(board_size, seed)
+    game.snake = cycle_snake(board_size, length)
+    game.apple = game.spawn_apple()
+    return game
+
+
+def advance_along_cycle(snake):
+    size = snake.board_size
+    head_x, head_y = snake.head
+    snake.advance(cycle_direction(head_y * size + head_x, size))
+
+
+def bench_tick(results, number, repeat):
+    for name, length in LENGTHS.items():
+        snake = cycle_snake(BOARD_SIZE, length)
+        seconds = measure(lambda: advance_along_cycle(snake), number, repeat)
+        assert not snake.collided
+        results[f'tick.move_collide.len_{name}'] = {'value': 1.0 / seconds, 'unit': 'ticks/s'}
+
+
+def bench_apple(results, number, repeat):
+    # Spawning with 1 and 10 free cells left
+    for free in (1, 10):
+        game = cycle_game(BOARD_SIZE, BOARD_SIZE * BOARD_SIZE - free)
+        seconds = measure(game.spawn_apple, number, repeat)
+        results[f'apple.spawn.free_{free}'] = {'value': seconds * 1e6, 'unit': 'us'}
+
+
+def bench_swarm(results, number, repeat):
+    # Straight along a row of a 500x500 board, with the item count going up a hundredfold
+    for density in (0.001, 0.01, 0.1):
+        game = SwarmState(500, seed=0, density=density)
+        seconds = measure(game.step, number, repeat)
+        assert game.status == 'running'
+        results[f'swarm.tick.density_{density}'] = {'value': 1.0 / seconds, 'unit': 'ticks/s'}
+
+
+def bench_snapshot(results, number, repeat):
+    # A fresh game on the default board, and a snake filling a 500x500 board
+    for name, game in (('start', GameState(BOARD_SIZE, 0)), ('board_500_full', cycle_game(500, 500 * 500 - 1))):
+        data = dumps(game, 'medium')
+        count = number if name == 'start' else max(1, number // 50)
+        seconds = measure(lambda: dumps(game, 'medium'), count, repeat)
+        results[f'snapshot.dump.{name}'] = {'value': seconds * 1000, 'unit': 'ms'}
+        seconds = measure(lambda: loads(data), count, repeat)
+        results[f'snapshot.load.{name}'] = {'value': seconds * 1000, 'unit': 'ms'}
+        results[f'snapshot.size.{name}'] = {'value': len(data) / 1024, 'unit': 'KiB'}
+
+
+def bench_render(results, number, repeat):
+    surface = pygame.Surface((BOARD_SIZE * CELL_SIZE, BOARD_SIZE * CELL_SIZE)).convert()
+    atlas = SpriteAtlas(CELL_SIZE)
+    atlas.use_skin(SNAKE_COLORS[0])
+    for name, length in LENGTHS.items():
+        for full_redraw in (True, False):
+            game = cycle_game(BOARD_SIZE, length)
+            renderer = BoardRenderer(surface, atlas, BOARD_SIZE, CELL_SIZE, grid=True, full_redraw=full_redraw)
+
+            def frame():
+                advance_along_cycle(game.snake)
+                game.ticks += 1
+                renderer.draw(game, [])
+
+            seconds = measure(frame, number, repeat)
+            kind = 'full' if full_redraw else 'incremental'
+            results[f'render.{kind}.len_{name}'] = {'value': seconds * 1000, 'unit': 'ms/frame'}
+
+    # A 500x500 board through the scrolling camera
+    window = pygame.Surface((600, 600)).convert()
+    game = cycle_game(500, 5000)
+    renderer = ViewportRenderer(window, atlas, 500, CELL_SIZE, grid=True)
+    seconds = measure(lambda: renderer.draw(game, [], 0.5), number, repeat)
+    results['render.viewport.board_500'] = {'value': seconds * 1000, 'unit': 'ms/frame'}
+
+
+def bench_capture(results, number, repeat):
+    # Copying a 600x600 frame out of the surface, which is all capture costs
+    # the game loop, and GIF encoding of a moving snake's frames
+    import numpy as np
+    from snakegame.capture import GifWriter
+
+    surface = pygame.Surface((BOARD_SIZE * CELL_SIZE, BOARD_SIZE * CELL_SIZE)).convert()
+    atlas = SpriteAtlas(CELL_SIZE)
+    atlas.use_skin(SNAKE_COLORS[0])
+    game = cycle_game(BOARD_SIZE, 100)
+    renderer = BoardRenderer(surface, atlas, BOARD_SIZE, CELL_SIZE, grid=True)
+    renderer.draw(game, [])
+    seconds = measure(lambda: np.array(surface.get_view('2'), copy=True), number, repeat)
+    results['capture.grab'] = {'value': seconds * 1000, 'unit': 'ms/frame'}
+
+    frames = []
+    for _ in range(number):
+        advance_along_cycle(game.snake)
+        game.ticks += 1
+        renderer.draw(game, [])
+        frames.append(np.array(surface.get_view('2'), copy=True).T & 0xffffff)
+    with tempfile.TemporaryDirectory() as scratch:
+        writer = GifWriter(os.path.join(scratch, 'clip.gif'), surface.get_size())
+        start = time.perf_counter()
+        for pixels in frames:
+            writer.add(pixels, 5)
+        writer.close()
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(writer.path)
+    results['capture.gif_encode'] = {'value': len(frames) / elapsed, 'unit': 'frames/s'}
+    results['capture.gif_size'] = {'value': size / len(frames), 'unit': 'bytes/frame'}
+
+
+def bench_heatmap(results, number, repeat):
+    # What recording adds to a tick, and adding up 500x500 heatmaps (per heatmap added)
+    import numpy as np
+    from snakegame.heatmap import Heatmap, combine
+
+    heatmap = Heatmap(BOARD_SIZE)
+    game = cycle_game(BOARD_SIZE, 100)
+    seconds = measure(lambda: heatmap.record(game), number, repeat)
+    results['heatmap.record'] = {'value': seconds * 1e6, 'unit': 'us/tick'}
+
+    parts = [Heatmap(500, np.ones((3, 500, 500), np.uint32)) for _ in range(10)]
+    seconds = measure(lambda: combine(parts), max(1, number // 50), repeat)
+    results['heatmap.combine.board_500'] = {'value': seconds * 1000 / len(parts), 'unit': 'ms/heatmap'}
+
+
+def bench_head(results, number, repeat):
+    surface = pygame.Surface((CELL_SIZE, CELL_SIZE))
+    seconds = measure(lambda: draw_head_with_pattern(surface, (0, 255, 0), CELL_SIZE), number, repeat)
+    results['sprites.draw_head_with_pattern'] = {'value': seconds * 1e6, 'unit': 'us'}
+    atlas = SpriteAtlas(CELL_SIZE)
+    atlas.prerender()
+    seconds = measure(lambda: atlas.get(SNAKE_COLORS[0], 'head'), number, repeat)
+    results['sprites.atlas_lookup'] = {'value': seconds * 1e6, 'unit': 'us'}
+
+
+def load_game_module():
+    # The game script has a hyphen in its name, so it is loaded by path
+    spec = importlib.util.spec_from_file_location('snake_game', os.path.join(ROOT, 'SnakeGame-1.3.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def close_game(game):
+    # Writes whatever the game still has pending into the scratch directory,
+    # before the caller leaves it. Left to the exit hooks, the relative
+    # data.json would land in the directory the suite was started from.
+    game.saver.close()
+    if game.stats is not None:
+        game.stats.close()
+        game.stats = None
+
+
+def bench_persistence(results, number, repeat):
+    # Runs in a scratch directory, the game reads and writes relative paths
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        game = None
+        try:
+            game = load_game_module()
+            game.load_data()
+            game.save_data()
+            game.saver.flush()
+            data = json.load(open('data.json'))
+
+            seconds = measure(game.save_data, number, repeat)
+            results['persistence.save_data.call'] = {'value': seconds * 1e6, 'unit': 'us'}
+            seconds = measure(lambda: write_json_atomic('data.json', data), max(1, number // 10), repeat)
+            results['persistence.write_json_atomic'] = {'value': seconds * 1000, 'unit': 'ms'}
+            seconds = measure(game.load_data, max(1, number // 10), repeat)
+            results['persistence.load_data'] = {'value': seconds * 1000, 'unit': 'ms'}
+
+            saver = AsyncSaver('flush.json', interval=0.0)
+            seconds = measure(lambda: (saver.save(data), saver.flush()), max(1, number // 10), repeat)
+            saver.close()
+            results['persistence.save_and_flush'] = {'value': seconds * 1000, 'unit': 'ms'}
+
+            store = game.stats
+            seconds = measure(lambda: store.record_game('medium', 10, 13, 300, 30.0, 'self'),
+                              max(1, number // 10), repeat)
+            results['persistence.record_game'] = {'value': seconds * 1000, 'unit': 'ms'}
+            seconds = measure(lambda: (store.totals(), store.recent(10)), number, repeat)
+            results['persistence.stats_summary'] = {'value': seconds * 1e6, 'unit': 'us'}
+        finally:
+            if game is not None:
+                close_game(game)
+            os.chdir(cwd)
+
+
+def bench_menu_idle(results, seconds):
+    # CPU used by the main menu while nobody touches it, as a fraction of one core
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        game = None
+        try:
+            game = load_game_module()
+            screen = game.open_window()
+            game.load_data()
+            timer = threading.Timer(seconds, lambda: pygame.event.post(pygame.event.Event(pygame.QUIT)))
+            start_cpu = time.process_time()
+            start = time.perf_counter()
+            timer.start()
+            game.mode_selection_screen(screen)  # Returns on the QUIT
+            cpu = time.process_time() - start_cpu
+            wall = time.perf_counter() - start
+        finally:
+            if game is not None:
+                close_game(game)
+            os.chdir(cwd)
+    results['menu.idle_cpu'] = {'value': cpu / wall * 100, 'unit': '% of a core'}
+
+
+BENCHES = {
+    'tick': bench_tick,
+    'apple': bench_apple,
+    'swarm': bench_swarm,
+    'snapshot': bench_snapshot,
+    'render': bench_render,
+    'capture': bench_capture,
+    'heatmap': bench_heatmap,
+    'head': bench_head,
+    'persistence': bench_persistence,
+}
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, path):
+    with open(path) as f:
+        old = json.load(f)['results']
+    print(f'\n{"benchmark":<40} {"old":>12} {"new":>12} {"change":>8}')
+    for name, result in results.items():
+        if name not in old:
+            continue
+        before, after = old[name]['value'], result['value']
+        change = (after - before) / before * 100 if before else 0.0
+        print(f'{name:<40} {before:>12.3f} {after:>12.3f} {change:>+7.1f}%  {result["unit"]}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Snake game benchmark suite')
+    parser.add_argument('--output', default='bench.json', help='where to write the results')
+    parser.add_argument('--compare', metavar='FILE', help='earlier results to compare against')
+    parser.add_argument('--quick', action='store_true', help='fewer iterations, for a smoke run')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHES) + ['menu'], help='run just these groups')
+    args = parser.parse_args()
+
+    number, repeat, idle_seconds = (50, 3, 0.5) if args.quick else (500, 7, 3.0)
+    pygame.init()
+    pygame.display.set_mode((1, 1))  # Sprites are converted to the display format
+    results = {}
+    for name, bench in BENCHES.items():
+        if args.only and name not in args.only:
+            continue
+        bench(results, number, repeat)
+    # Last, since the menu shuts pygame down when it quits
+    if not args.only or 'menu' in args.only:
+        bench_menu_idle(results, idle_seconds)
+
+    for name, result in results.items():
+        print(f'{name:<40} {result["value"]:>14,.3f} {result["unit"]}')
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'platform': platform.platform(),
+            'number': number,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Results written to {args.output}')
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
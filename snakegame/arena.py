@@ -0,0 +1,325 @@
+import random
+from collections import deque
+
+from snakegame.config import MOVES, SNAKE_START_LENGTH
+from snakegame.game import InputBuffer
+from snakegame.replay import ReplayError, read_varint, write_varint
+
+ARENA_BOARD_SIZE = 64
+ARENA_APPLES = 16
+ARENA_TICK_RATE = 10
+SPAWN_ATTEMPTS = 20
+
+# Server messages are frames: a varint payload length, then the payload. A
+# payload is the tick number, a record count and the records, each starting
+# with a varint (id << 3) | kind:
+#   MOVE         direction index | grew << 2 (one byte); grew means the tail stayed
+#   SPAWN        direction index, length, then every cell head first
+#   DEATH        nothing, the snake is removed
+#   APPLE_ADD    the id is the cell
+#   APPLE_REMOVE the id is the cell
+#   WELCOME      the id is the receiver's player id, then the board size and tick rate
+# A new client gets one payload with WELCOME and the whole board as SPAWN and
+# APPLE_ADD records, then one delta per tick, so a snake that keeps going
+# costs two or three bytes a tick however long it is.
+# Clients send one byte per direction change: its index into MOVES.
+MOVE = 0
+SPAWN = 1
+DEATH = 2
+APPLE_ADD = 3
+APPLE_REMOVE = 4
+WELCOME = 5
+
+
+def frame(payload):
+    out = bytearray()
+    write_varint(out, len(payload))
+    return bytes(out + payload)
+
+
+class FrameReader:
+    # Splits a byte stream into frame payloads, however it was chunked
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer += data
+        payloads = []
+        pos = 0
+        while True:
+            try:
+                length, start = read_varint(self.buffer, pos)
+            except ReplayError:
+                break  # Length not complete yet
+            if start + length > len(self.buffer):
+                break
+            payloads.append(bytes(self.buffer[start:start + length]))
+            pos = start + length
+        del self.buffer[:pos]
+        return payloads
+
+
+class ArenaSnake:
+    # One player's snake. Cells are y * board_size + x, head first. It has
+    # the direction/can_turn pair InputBuffer expects from a game.
+    def __init__(self, player_id):
+        self.id = player_id
+        self.body = deque()
+        self.direction = MOVES[0]
+        self.pending_growth = 0
+        self.alive = False
+        self.leaving = False
+        self.score = 0
+        self.inputs = InputBuffer()
+
+    def can_turn(self, direction):
+        return (direction[0] + self.direction[0] != 0) or (direction[1] + self.direction[1] != 0)
+
+
+class Arena:
+    # Authoritative state of an N-snake game on one torus board with the
+    # single player rules: every tail moves out of the way before collisions
+    # are checked and an apple delays the tail by one move. A head that ends
+    # on any body dies, and heads that meet on the same cell all die. Dead
+    # players respawn on the next tick with room for them.
+    #
+    # All changes happen in step(), which returns the tick's delta payload.
+    def __init__(self, board_size=ARENA_BOARD_SIZE, apples=ARENA_APPLES, seed=None):
+        self.size = board_size
+        self.cells = board_size * board_size
+        self.rng = random.Random(seed)
+        self.grid = bytearray(self.cells)
+        self.players = {}
+        self.apples = set()
+        self.apple_target = apples
+        self.tick = 0
+        self.next_id = 0
+        self.records = bytearray()
+        self.record_count = 0
+
+    def add_player(self):
+        player = ArenaSnake(self.next_id)
+        self.next_id += 1
+        self.players[player.id] = player
+        return player
+
+    def remove_player(self, player_id):
+        # Takes effect on the next step so every client sees it in order
+        player = self.players.get(player_id)
+        if player is not None:
+            player.leaving = True
+
+    def _record(self, record_id, kind):
+        write_varint(self.records, record_id << 3 | kind)
+        self.record_count += 1
+
+    def _random_free_cell(self):
+        # The board is mostly empty in an arena, so a few random probes beat
+        # keeping a free list in step with every snake
+        for _ in range(SPAWN_ATTEMPTS):
+            cell = self.rng.randrange(self.cells)
+            if not self.grid[cell] and cell not in self.apples:
+                return cell
+        return None
+
+    def _step_cell(self, cell, direction):
+        y, x = divmod(cell, self.size)
+        return (y + direction[1]) % self.size * self.size + (x + direction[0]) % self.size
+
+    def _spawn(self, player):
+        head = self._random_free_cell()
+        if head is None:
+            return False
+        direction = self.rng.choice(MOVES)
+        back = (-direction[0], -direction[1])
+        cells = [head]
+        for _ in range(SNAKE_START_LENGTH - 1):
+            cells.append(self._step_cell(cells[-1], back))
+        if any(self.grid[cell] or cell in self.apples for cell in cells[1:]):
+            return False
+        for cell in cells:
+            self.grid[cell] = 1
+        player.body = deque(cells)
+        player.direction = direction
+        player.pending_growth = 0
+        player.alive = True
+        player.inputs.clear()
+        self._record(player.id, SPAWN)
+        write_varint(self.records, MOVES.index(direction))
+        write_varint(self.records, len(cells))
+        for cell in cells:
+            write_varint(self.records, cell)
+        return True
+
+    def _kill(self, player):
+        for cell in player.body:
+            self.grid[cell] = 0
+        player.body.clear()
+        player.alive = False
+        self._record(player.id, DEATH)
+
+    def step(self):
+        grid = self.grid
+        movers = []
+        for player in list(self.players.values()):
+            if player.leaving:
+                if player.alive:
+                    self._kill(player)
+                del self.players[player.id]
+            elif player.alive:
+                direction = player.inputs.pop(player)
+                if direction is not None:
+                    player.direction = direction
+                movers.append(player)
+
+        # Every tail moves first, then heads are checked against what's left
+        heads = {}
+        grew = {}
+        for player in movers:
+            head = self._step_cell(player.body[0], player.direction)
+            heads[head] = heads.get(head, 0) + 1
+            grew[player.id] = player.pending_growth > 0
+            if player.pending_growth:
+                player.pending_growth -= 1
+            else:
+                grid[player.body.pop()] = 0
+        survivors = []
+        crashed = []
+        for player in movers:
+            head = self._step_cell(player.body[0], player.direction)
+            if grid[head] or heads[head] > 1:
+                crashed.append(player)
+            else:
+                survivors.append((player, head))
+        # Bodies are only cleared once every head has been checked against them
+        for player in crashed:
+            self._kill(player)
+        for player, head in survivors:
+            grid[head] = 1
+            player.body.appendleft(head)
+            self._record(player.id, MOVE)
+            self.records.append(MOVES.index(player.direction) | grew[player.id] << 2)
+            if head in self.apples:
+                self.apples.discard(head)
+                self._record(head, APPLE_REMOVE)
+                player.pending_growth += 1
+                player.score += 1
+
+        for player in self.players.values():
+            if not player.alive:
+                self._spawn(player)
+        while len(self.apples) < self.apple_target:
+            cell = self._random_free_cell()
+            if cell is None:
+                break
+            self.apples.add(cell)
+            self._record(cell, APPLE_ADD)
+
+        self.tick += 1
+        return self._take_payload()
+
+    def _take_payload(self):
+        out = bytearray()
+        write_varint(out, self.tick)
+        write_varint(out, self.record_count)
+        out += self.records
+        self.records = bytearray()
+        self.record_count = 0
+        return bytes(out)
+
+    def snapshot(self, player_id, tick_rate=ARENA_TICK_RATE):
+        # The whole board as one payload, for a client that just connected
+        records = bytearray()
+        count = 1
+        write_varint(records, player_id << 3 | WELCOME)
+        write_varint(records, self.size)
+        write_varint(records, tick_rate)
+        for player in self.players.values():
+            if player.alive:
+                count += 1
+                write_varint(records, player.id << 3 | SPAWN)
+                write_varint(records, MOVES.index(player.direction))
+                write_varint(records, len(player.body))
+                for cell in player.body:
+                    write_varint(records, cell)
+        for cell in self.apples:
+            count += 1
+            write_varint(records, cell << 3 | APPLE_ADD)
+        out = bytearray()
+        write_varint(out, self.tick)
+        write_varint(out, count)
+        return bytes(out + records)
+
+
+class ArenaView:
+    # A client's copy of the arena, rebuilt from the server's payloads. It
+    # applies a tick in the order the server ran it: deaths, tails, heads,
+    # then spawns and apples.
+    def __init__(self):
+        self.player_id = None
+        self.size = 0
+        self.tick_rate = ARENA_TICK_RATE
+        self.tick = 0
+        self.snakes = {}  # id -> deque of cells, head first
+        self.directions = {}
+        self.apples = set()
+        self.grid = bytearray()
+
+    def apply(self, payload):
+        tick, pos = read_varint(payload, 0)
+        count, pos = read_varint(payload, pos)
+        moves = []
+        spawns = []
+        deaths = []
+        for _ in range(count):
+            value, pos = read_varint(payload, pos)
+            record_id, kind = value >> 3, value & 7
+            if kind == MOVE:
+                moves.append((record_id, payload[pos]))
+                pos += 1
+            elif kind == SPAWN:
+                direction, pos = read_varint(payload, pos)
+                length, pos = read_varint(payload, pos)
+                cells = []
+                for _ in range(length):
+                    cell, pos = read_varint(payload, pos)
+                    cells.append(cell)
+                spawns.append((record_id, direction, cells))
+            elif kind == DEATH:
+                deaths.append(record_id)
+            elif kind == APPLE_ADD:
+                self.apples.add(record_id)
+            elif kind == APPLE_REMOVE:
+                self.apples.discard(record_id)
+            elif kind == WELCOME:
+                self.player_id = record_id
+                self.size, pos = read_varint(payload, pos)
+                self.tick_rate, pos = read_varint(payload, pos)
+                self.grid = bytearray(self.size * self.size)
+                self.snakes.clear()
+                self.directions.clear()
+            else:
+                raise ReplayError(f'Unknown arena record kind {kind}')
+
+        grid = self.grid
+        for snake_id in deaths:
+            for cell in self.snakes.pop(snake_id, ()):
+                grid[cell] = 0
+            self.directions.pop(snake_id, None)
+        for snake_id, value in moves:
+            if not value & 4:
+                grid[self.snakes[snake_id].pop()] = 0
+        for snake_id, value in moves:
+            direction = MOVES[value & 3]
+            body = self.snakes[snake_id]
+            y, x = divmod(body[0], self.size)
+            head = (y + direction[1]) % self.size * self.size + (x + direction[0]) % self.size
+            body.appendleft(head)
+            grid[head] = 1
+            self.directions[snake_id] = direction
+        for snake_id, direction, cells in spawns:
+            self.snakes[snake_id] = deque(cells)
+            self.directions[snake_id] = MOVES[direction]
+            for cell in cells:
+                grid[cell] = 1
+        self.tick = tick
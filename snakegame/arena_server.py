@@ -0,0 +1,161 @@
+import asyncio
+import random
+from collections import deque
+
+from snakegame.arena import ARENA_TICK_RATE, Arena, ArenaView, FrameReader, frame
+from snakegame.config import MOVES
+
+MAX_CLIENT_BUFFER = 1 << 20  # Bytes queued for a client before it is dropped as too slow
+
+
+class ArenaServer:
+    # Runs an Arena at a fixed tick rate on asyncio. Connections only queue
+    # direction changes; the tick loop is the only thing that changes state,
+    # encodes the delta once and queues it on every socket without waiting,
+    # so a slow client never holds up a tick. A client that falls more than
+    # MAX_CLIENT_BUFFER behind is disconnected.
+    def __init__(self, arena=None, tick_rate=ARENA_TICK_RATE, history=100000):
+        self.arena = arena or Arena()
+        self.tick_rate = tick_rate
+        self.tick_length = 1.0 / tick_rate
+        self.clients = {}
+        self.running = False
+
+        # Tick metrics, in seconds
+        self.lateness = deque(maxlen=history)  # How far past its deadline each tick started
+        self.durations = deque(maxlen=history)
+        self.bytes_sent = 0
+        self.dropped = 0
+        self.peak_clients = 0
+
+    async def handle_client(self, reader, writer):
+        player = self.arena.add_player()
+        writer.write(frame(self.arena.snapshot(player.id, self.tick_rate)))
+        self.clients[player.id] = writer
+        self.peak_clients = max(self.peak_clients, len(self.clients))
+        try:
+            while True:
+                data = await reader.read(256)
+                if not data:
+                    break
+                for byte in data:
+                    if byte < len(MOVES):
+                        player.inputs.push(MOVES[byte])
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.pop(player.id, None)
+            self.arena.remove_player(player.id)
+            writer.close()
+
+    def broadcast(self, payload):
+        data = frame(payload)
+        for player_id, writer in list(self.clients.items()):
+            transport = writer.transport
+            if transport.is_closing():
+                continue
+            if transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+                self.dropped += 1
+                transport.abort()
+                continue
+            writer.write(data)
+            self.bytes_sent += len(data)
+
+    async def run(self, duration=None):
+        loop = asyncio.get_running_loop()
+        self.running = True
+        next_tick = loop.time()
+        end = None if duration is None else next_tick + duration
+        while self.running and (end is None or next_tick < end):
+            next_tick += self.tick_length
+            delay = next_tick - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            start = loop.time()
+            self.lateness.append(start - next_tick)
+            self.broadcast(self.arena.step())
+            self.durations.append(loop.time() - start)
+            if loop.time() - next_tick > self.tick_length:
+                # Too far behind to catch up, skip ticks instead of bursting
+                next_tick = loop.time()
+
+    def stop(self):
+        self.running = False
+
+    def report(self):
+        def percentile(values, fraction):
+            ordered = sorted(values)
+            return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+        ticks = len(self.durations)
+        lines = [
+            f'Ticks: {ticks} at {self.tick_rate}/s, clients: {len(self.clients)} (peak {self.peak_clients}), '
+            f'dropped: {self.dropped}',
+            f'Tick jitter: p50 {percentile(self.lateness, 0.5) * 1000:.2f}ms  '
+            f'p99 {percentile(self.lateness, 0.99) * 1000:.2f}ms  max {max(self.lateness, default=0) * 1000:.2f}ms',
+            f'Tick work: p50 {percentile(self.durations, 0.5) * 1000:.2f}ms  '
+            f'p99 {percentile(self.durations, 0.99) * 1000:.2f}ms  max {max(self.durations, default=0) * 1000:.2f}ms',
+            f'Sent: {self.bytes_sent / max(ticks, 1):,.0f} bytes/tick over all clients',
+        ]
+        return lines
+
+
+async def serve(host='127.0.0.1', port=0, arena=None, tick_rate=ARENA_TICK_RATE):
+    # Starts listening and returns (ArenaServer, asyncio server); call
+    # ArenaServer.run() to start ticking. Port 0 picks a free port.
+    arena_server = ArenaServer(arena, tick_rate)
+    server = await asyncio.start_server(arena_server.handle_client, host, port)
+    return arena_server, server
+
+
+def bot_move(view, rng, turn_chance=0.1):
+    # A bot's choice on its copy of the board: keep going unless the cell
+    # ahead is taken or on a whim, and never turn into an occupied cell
+    body = view.snakes.get(view.player_id)
+    if not body:
+        return None
+    size = view.size
+    direction = view.directions[view.player_id]
+    y, x = divmod(body[0], size)
+
+    def free(move):
+        return not view.grid[(y + move[1]) % size * size + (x + move[0]) % size]
+
+    if free(direction) and rng.random() >= turn_chance:
+        return None
+    options = [move for move in MOVES
+               if move[0] + direction[0] or move[1] + direction[1]]
+    options = [move for move in options if free(move)] or options
+    return rng.choice(options)
+
+
+async def run_bot(host, port, seed=None, mirror=True, turn_chance=0.1):
+    # A localhost test client. With `mirror` it decodes every tick into an
+    # ArenaView and steers around what it sees; without, it only splits the
+    # stream into frames and turns at random, which is enough to load a server.
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    frames = FrameReader()
+    view = ArenaView() if mirror else None
+    ticks = 0
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            for payload in frames.feed(data):
+                ticks += 1
+                if view is not None:
+                    view.apply(payload)
+                    move = bot_move(view, rng, turn_chance)
+                elif rng.random() < turn_chance:
+                    move = rng.choice(MOVES)
+                else:
+                    move = None
+                if move is not None:
+                    writer.write(bytes([MOVES.index(move)]))
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+    return ticks
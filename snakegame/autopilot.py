@@ -0,0 +1,249 @@
+from array import array
+from heapq import heappop, heappush
+from itertools import chain
+
+from snakegame.config import MOVES, DOWN, RIGHT
+
+SEARCH_BUDGET = 20000  # Cells an A* search may expand before giving up
+SHORTCUT_LIMIT = 0.5  # Fraction of the board after which the cycle is followed strictly
+GROWTH_BUFFER = 3  # Spare cycle distance kept behind the tail when cutting across
+
+
+def cycle_order(cell, size):
+    # Position of a cell on the Hamiltonian cycle used by the autopilot: every
+    # row is walked left to right starting one column further left than the
+    # row above, wrapping around the board, then the cycle steps down. On the
+    # torus that closes into a single cycle for any board size.
+    y, x = divmod(cell, size)
+    return y * size + (x + y) % size
+
+
+def cycle_direction(cell, size):
+    # Direction that follows the cycle out of a cell
+    y, x = divmod(cell, size)
+    return DOWN if (x + y + 1) % size == 0 else RIGHT
+
+
+def neighbours(cell, size):
+    # Cells reached by each of MOVES, wrapping at the edges
+    y, x = divmod(cell, size)
+    row = y * size
+    return (
+        (y - 1) % size * size + x,
+        (y + 1) % size * size + x,
+        row + (x - 1) % size,
+        row + (x + 1) % size,
+    )
+
+
+class AutopilotPolicy:
+    # Plays the game on its own. While the body lies backwards along the
+    # Hamiltonian cycle from the head (which is how every game starts) it
+    # follows the cycle, and cuts across whenever an A* shortest path to the
+    # apple, or failing that the cell nearest the apple, stays ahead of the
+    # tail on the cycle. That ordering can't be broken by those moves, so the
+    # snake never dies and clears the board. Any other position (a game taken
+    # over halfway, obstacles it doesn't know about) is played in free mode:
+    # the shortest path to the apple is only taken if the tail is still
+    # reachable at the end of it, otherwise it follows its tail.
+    #
+    # Searches reuse flat arrays stamped with a search id, so nothing is
+    # allocated or cleared per search, and each one gives up after
+    # SEARCH_BUDGET cells to stay inside a tick even on a 500x500 board.
+    def __init__(self, seed=None, budget=SEARCH_BUDGET, shortcut_limit=SHORTCUT_LIMIT):
+        self.budget = budget
+        self.shortcut_limit = shortcut_limit
+        self.size = None
+        self.snake = None
+        self.searches = 0
+        self.failed_searches = 0
+
+    def _prepare(self, size):
+        if size == self.size:
+            return
+        cells = size * size
+        self.size = size
+        self.cells = cells
+        self.seen = array('I', bytes(4 * cells))
+        self.cost = array('i', bytes(4 * cells))
+        self.parent = array('i', bytes(4 * cells))
+        self.stamp = 0
+
+    def __call__(self, state):
+        snake = state.snake
+        self._prepare(state.board_size)
+        if snake is not self.snake:
+            # A new game (GameState.reset makes a new Snake)
+            self.snake = snake
+            self.on_cycle = self._is_cycle_ordered(snake)
+            self.path = []
+            self.path_apple = None
+            self.stalled = 0
+        size = self.size
+        head = snake.head[1] * size + snake.head[0]
+        apple = None if state.apple is None else state.apple[1] * size + state.apple[0]
+        if self.on_cycle:
+            target = self._cycle_move(snake, head, apple)
+        else:
+            target = self._free_move(snake, head, apple)
+        if target is None:
+            return None
+        return MOVES[neighbours(head, size).index(target)]
+
+    def _cell(self, position):
+        return position[1] * self.size + position[0]
+
+    def _distance(self, a, b):
+        # Steps from a to b going forwards along the cycle
+        return (cycle_order(b, self.size) - cycle_order(a, self.size)) % self.cells
+
+    def _is_cycle_ordered(self, snake):
+        # The body has to run backwards along the cycle, and the gap between
+        # the head and the tail has to fit the growth still to come
+        head = self._cell(snake.head)
+        tail = self._cell(snake.tail)
+        if len(snake.body) > 1 and self._distance(head, tail) <= snake.pending_growth:
+            return False
+        previous = self.cells
+        for position in snake.body:
+            distance = self._distance(tail, self._cell(position))
+            if distance >= previous:
+                return False
+            previous = distance
+        return True
+
+    def _planned_step(self, snake, head, apple):
+        # Next cell of a shortest path to the apple. The path is kept while it
+        # is being followed, since the cells ahead stay free until then.
+        path = self.path
+        if path and self.path_apple == apple and path[-1] == head:
+            path.pop()
+        else:
+            path = self._search(snake.grid, head, apple) or []
+            path.reverse()  # Popped from the end
+            self.path = path
+            self.path_apple = apple
+        return path[-1] if path else None
+
+    def _cycle_move(self, snake, head, apple):
+        size = self.size
+        ahead = neighbours(head, size)[MOVES.index(cycle_direction(head, size))]
+        if apple is None or len(snake) >= self.shortcut_limit * self.cells:
+            return ahead
+
+        # A shortcut may go as far as the apple but has to leave room behind
+        # the tail for everything the snake is still going to grow
+        grid = snake.grid
+        room = self._distance(head, self._cell(snake.tail)) - snake.pending_growth - GROWTH_BUFFER
+        limit = min(self._distance(head, apple), room - 1)
+        allowed = {}
+        for cell in neighbours(head, size):
+            distance = self._distance(head, cell)
+            if not grid[cell] and 0 < distance <= limit:
+                allowed[cell] = distance
+        if not allowed:
+            return ahead
+        step = self._planned_step(snake, head, apple)
+        if step in allowed:
+            return step
+        return max(allowed, key=allowed.get)
+
+    def _free_move(self, snake, head, apple):
+        if apple is not None:
+            path = self._search(snake.grid, head, apple)
+            # Stalling can go on forever, so after a full board's worth of
+            # moves the apple is taken even when it isn't provably safe
+            if path and (self.stalled >= self.cells or self._tail_reachable(snake, path, 1) is not None):
+                self.stalled = 0
+                return path[0]
+        self.stalled += 1
+
+        # No safe way to the apple: stall on the move that keeps the tail furthest away
+        best = None
+        best_length = -1
+        fallback = None
+        tail = self._cell(snake.tail)
+        for cell in neighbours(head, self.size):
+            if snake.grid[cell] and (cell != tail or snake.pending_growth):
+                continue
+            fallback = cell
+            length = self._tail_reachable(snake, [cell], 0)
+            if length is not None and length > best_length:
+                best, best_length = cell, length
+        return best if best is not None else fallback
+
+    def _tail_reachable(self, snake, path, growth):
+        # Moves a copy of the snake along `path` and returns the length of the
+        # shortest way from its new head to its new tail, or None if there is
+        # none. `growth` is what the snake gains at the end of the path.
+        size = self.size
+        grid = bytearray(snake.grid)
+        pending = snake.pending_growth
+        vacating = chain((y * size + x for x, y in reversed(snake.body)), path)
+        for cell in path:
+            if pending:
+                pending -= 1
+            else:
+                grid[next(vacating)] = 0
+            grid[cell] = 1
+        tail = next(vacating)
+        route = self._search(grid, path[-1], tail)
+        # With growth still to come the tail stays put, so it can't be the next step
+        if route is None or len(route) <= pending + growth:
+            return None
+        return len(route)
+
+    def _search(self, grid, start, goal):
+        # A* over free cells with the wrapped Manhattan distance as heuristic.
+        # The goal may be occupied (the tail). Returns the cells after `start`
+        # up to and including `goal`, or None.
+        size = self.size
+        self.stamp += 1
+        if self.stamp == 0xFFFFFFFF:
+            self.seen = array('I', bytes(4 * self.cells))
+            self.stamp = 1
+        stamp = self.stamp
+        seen = self.seen
+        cost = self.cost
+        parent = self.parent
+        goal_y, goal_x = divmod(goal, size)
+        self.searches += 1
+
+        def estimate(cell):
+            y, x = divmod(cell, size)
+            dx = abs(x - goal_x)
+            dy = abs(y - goal_y)
+            return min(dx, size - dx) + min(dy, size - dy)
+
+        seen[start] = stamp
+        cost[start] = 0
+        # Ties go to the deeper node so open ground is crossed in a straight line
+        heap = [(estimate(start), 0, start)]
+        expanded = 0
+        while heap:
+            _, depth, cell = heappop(heap)
+            steps = -depth
+            if steps > cost[cell]:
+                continue  # Superseded by a shorter way in
+            if cell == goal:
+                path = []
+                while cell != start:
+                    path.append(cell)
+                    cell = parent[cell]
+                path.reverse()
+                return path
+            expanded += 1
+            if expanded > self.budget:
+                break
+            steps += 1
+            for neighbour in neighbours(cell, size):
+                if grid[neighbour] and neighbour != goal:
+                    continue
+                if seen[neighbour] == stamp and cost[neighbour] <= steps:
+                    continue
+                seen[neighbour] = stamp
+                cost[neighbour] = steps
+                parent[neighbour] = cell
+                heappush(heap, (steps + estimate(neighbour), -steps, neighbour))
+        self.failed_searches += 1
+        return None
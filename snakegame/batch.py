@@ -0,0 +1,176 @@
+import numpy as np
+
+from snakegame.config import BOARD_SIZE, INITIAL_DIRECTION
+from snakegame.game import GameState, start_segments
+from snakegame.policies import MOVES
+
+# Board status codes, matching GameState.status
+RUNNING = 0
+DEAD = 1
+CLEARED = 2
+STATUS_NAMES = ('running', 'dead', 'cleared')
+
+# Actions are indices into MOVES (UP, DOWN, LEFT, RIGHT), or -1 to keep going
+MOVE_ARRAY = np.array(MOVES, dtype=np.int64)
+OPPOSITE = np.array([MOVES.index((-dx, -dy)) for dx, dy in MOVES], dtype=np.int64)
+
+
+class BatchSnakeEnv:
+    # N independent boards stepped together with array ops. Each board keeps
+    # its body as cell indices (y * board_size + x) in a ring buffer plus a
+    # boolean occupancy row, following the same rules as GameState: torus
+    # wraparound, the tail moves before the collision check and growth delays
+    # the tail by one move per apple.
+    def __init__(self, num_boards, board_size=BOARD_SIZE, seed=None):
+        self.num_boards = num_boards
+        self.board_size = board_size
+        self.capacity = board_size * board_size
+        self.rng = np.random.default_rng(seed)
+
+        self.body = np.zeros((num_boards, self.capacity), dtype=np.int32)
+        self.grid = np.zeros((num_boards, self.capacity), dtype=bool)
+        self.head_ptr = np.zeros(num_boards, dtype=np.int64)
+        self.length = np.zeros(num_boards, dtype=np.int64)
+        self.pending = np.zeros(num_boards, dtype=np.int64)
+        self.head_x = np.zeros(num_boards, dtype=np.int64)
+        self.head_y = np.zeros(num_boards, dtype=np.int64)
+        self.direction = np.zeros(num_boards, dtype=np.int64)
+        self.apple = np.zeros(num_boards, dtype=np.int64)  # -1 once a board is full
+        self.apple_count = np.zeros(num_boards, dtype=np.int64)
+        self.ticks = np.zeros(num_boards, dtype=np.int64)
+        self.status = np.zeros(num_boards, dtype=np.int8)
+        self.reset()
+
+    def reset(self, rows=None):
+        rows = np.arange(self.num_boards) if rows is None else np.asarray(rows, dtype=np.int64)
+        if rows.size == 0:
+            return
+        size = self.board_size
+        segments = start_segments(size)
+        cells = np.array([y * size + x for x, y in segments], dtype=np.int32)
+
+        # The ring buffer runs tail to head, so the head sits in the last used slot
+        self.grid[rows] = False
+        self.grid[rows[:, None], cells[None, :]] = True
+        self.body[rows, :len(cells)] = cells[::-1]
+        self.head_ptr[rows] = len(cells) - 1
+        self.length[rows] = len(cells)
+        self.pending[rows] = 0
+        self.head_x[rows], self.head_y[rows] = segments[0]
+        self.direction[rows] = MOVES.index(INITIAL_DIRECTION)
+        self.apple_count[rows] = 0
+        self.ticks[rows] = 0
+        self.status[rows] = RUNNING
+        self._spawn_apples(rows)
+
+    def _spawn_apples(self, rows):
+        # Uniform pick among each board's free cells: draw a rank below the free
+        # count and take the first cell where the running free count passes it
+        if rows.size == 0:
+            return
+        free = ~self.grid[rows]
+        counts = free.sum(axis=1)
+        full = counts == 0
+        self.status[rows[full]] = CLEARED
+        self.apple[rows[full]] = -1
+
+        rows, free, counts = rows[~full], free[~full], counts[~full]
+        if rows.size == 0:
+            return
+        ranks = (self.rng.random(rows.size) * counts).astype(np.int64)
+        self.apple[rows] = np.argmax(np.cumsum(free, axis=1) > ranks[:, None], axis=1)
+
+    def step(self, actions):
+        # Advances every running board by one tick; finished boards are left
+        # untouched until reset() is called for them
+        rows = np.flatnonzero(self.status == RUNNING)
+        if rows.size == 0:
+            return self.status
+
+        actions = np.asarray(actions, dtype=np.int64)[rows]
+        turn = (actions >= 0) & (actions != OPPOSITE[self.direction[rows]])
+        self.direction[rows[turn]] = actions[turn]
+
+        size = self.board_size
+        moves = MOVE_ARRAY[self.direction[rows]]
+        head_x = (self.head_x[rows] + moves[:, 0]) % size
+        head_y = (self.head_y[rows] + moves[:, 1]) % size
+        cells = head_y * size + head_x
+        self.head_x[rows] = head_x
+        self.head_y[rows] = head_y
+
+        # The tail moves out of the way first unless the board is growing
+        growing = self.pending[rows] > 0
+        self.pending[rows[growing]] -= 1
+        shrink = rows[~growing]
+        tail_slots = (self.head_ptr[shrink] - self.length[shrink] + 1) % self.capacity
+        self.grid[shrink, self.body[shrink, tail_slots]] = False
+        self.length[shrink] -= 1
+
+        hit = self.grid[rows, cells]
+        self.head_ptr[rows] = (self.head_ptr[rows] + 1) % self.capacity
+        self.body[rows, self.head_ptr[rows]] = cells
+        self.grid[rows, cells] = True
+        self.length[rows] += 1
+        self.ticks[rows] += 1
+        self.status[rows[hit]] = DEAD
+
+        eaten = rows[~hit & (cells == self.apple[rows])]
+        self.pending[eaten] += 1
+        self.apple_count[eaten] += 1
+        self._spawn_apples(eaten)
+        return self.status
+
+
+def verify_against_scalar(num_boards=64, steps=2000, board_size=8, seed=0):
+    # Drives the batch and one GameState per board with the same random actions.
+    # Apple placement uses different RNGs, so each scalar game is handed the
+    # batch's apple; everything else has to match tick for tick.
+    rng = np.random.default_rng(seed)
+    env = BatchSnakeEnv(num_boards, board_size, seed)
+    games = [GameState(board_size, seed) for _ in range(num_boards)]
+
+    def sync_apple(i):
+        apple = int(env.apple[i])
+        games[i].apple = None if apple < 0 else (apple % board_size, apple // board_size)
+
+    for i in range(num_boards):
+        sync_apple(i)
+
+    for tick in range(steps):
+        actions = rng.integers(-1, len(MOVES), num_boards)
+        was_running = env.status == RUNNING
+        env.step(actions)
+        for i in np.flatnonzero(was_running):
+            game = games[i]
+            game.step(None if actions[i] < 0 else MOVES[actions[i]])
+            if game.ate_apple:
+                # The scalar game spawned its own apple, take the batch one instead
+                sync_apple(i)
+            snake = game.snake
+            expected = (
+                game.status,
+                snake.head,
+                len(snake),
+                game.apple_count,
+                game.ticks,
+            )
+            actual = (
+                STATUS_NAMES[env.status[i]],
+                (int(env.head_x[i]), int(env.head_y[i])),
+                int(env.length[i] + env.pending[i]),
+                int(env.apple_count[i]),
+                int(env.ticks[i]),
+            )
+            if expected != actual:
+                raise AssertionError(f'board {i} diverged at tick {tick}: {expected} != {actual}')
+            if game.status != 'dead' and bytes(snake.grid) != env.grid[i].astype(np.uint8).tobytes():
+                raise AssertionError(f'board {i} occupancy diverged at tick {tick}')
+
+        done = np.flatnonzero(env.status != RUNNING)
+        if done.size:
+            env.reset(done)
+            for i in done:
+                games[i].reset()
+                sync_apple(i)
+    return True
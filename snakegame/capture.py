@@ -0,0 +1,349 @@
+import multiprocessing
+import os
+import queue
+import signal
+import struct
+import time
+import zlib
+
+import numpy as np
+import pygame
+
+from snakegame.config import BOARD_SIZE, SNAKE_COLORS, TICK_RATES
+from snakegame.game import GameState
+from snakegame.policies import make_policy
+from snakegame.render import make_renderer
+from snakegame.sprites import SpriteAtlas
+from snakegame.text import render_text
+
+# Gameplay clips as an animated GIF or a numbered PNG sequence, for bug
+# reports and the like. The game loop only copies each frame out of the
+# surface (one memcpy through a buffer view, since the next frame is drawn
+# over it) and hands it to an encoder process through a bounded queue. When
+# the encoder falls behind, frames are dropped and counted rather than
+# making the game wait.
+CAPTURE_FPS = 20
+QUEUE_FRAMES = 32
+MAX_PAUSE = 1.0
+
+# GIF: one global 256 colour palette, filled with the exact colours as they
+# first show up; past 256 a colour gets the nearest entry. The game only has
+# a handful of flat colours, so only antialiased text edges ever get moved.
+# Every frame after the first is cropped to the box of pixels that changed
+# and drawn over the previous one, and a frame with no change just makes the
+# previous one last longer.
+PALETTE_SIZE = 256
+LZW_MIN_CODE_SIZE = 8
+LZW_MAX_CODES = 4096
+GIF_SCREEN = struct.Struct('<6sHHBBB')
+GIF_LOOP = b'\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00'
+GIF_CONTROL = struct.Struct('<3sBHBB')
+GIF_IMAGE = struct.Struct('<BHHHHB')
+
+
+def lzw_encode(pixels):
+    # GIF flavoured LZW of a bytes object of palette indices, packed LSB first
+    clear = 1 << LZW_MIN_CODE_SIZE
+    next_code = clear + 2
+    code_size = LZW_MIN_CODE_SIZE + 1
+    table = {}
+    out = bytearray()
+    bits = clear
+    bit_count = code_size
+    prefix = pixels[0]
+    for index in pixels[1:]:
+        key = prefix << 8 | index
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        bits |= prefix << bit_count
+        bit_count += code_size
+        while bit_count >= 8:
+            out.append(bits & 0xff)
+            bits >>= 8
+            bit_count -= 8
+        if next_code < LZW_MAX_CODES:
+            table[key] = next_code
+            next_code += 1
+            # The decoder adds each entry one code later, so it widens one code later too
+            if next_code > 1 << code_size:
+                code_size += 1
+        else:
+            bits |= clear << bit_count
+            bit_count += code_size
+            table.clear()
+            next_code = clear + 2
+            code_size = LZW_MIN_CODE_SIZE + 1
+        prefix = index
+    for code in (prefix, clear + 1):
+        bits |= code << bit_count
+        bit_count += code_size
+        if code == prefix and next_code < LZW_MAX_CODES:
+            # The decoder still adds an entry for the last code
+            next_code += 1
+            if next_code > 1 << code_size:
+                code_size += 1
+    while bit_count > 0:
+        out.append(bits & 0xff)
+        bits >>= 8
+        bit_count -= 8
+    return bytes(out)
+
+
+def sub_blocks(data):
+    return b''.join(bytes((len(data[i:i + 255]),)) + data[i:i + 255] for i in range(0, len(data), 255)) + b'\x00'
+
+
+class Palette:
+    def __init__(self):
+        self.colors = []  # 0xRRGGBB per index
+        self.indices = {}  # 0xRRGGBB -> index, including colours mapped to a near one
+
+    def quantize(self, rgb):
+        # Palette indices (uint8, same shape) for an array of 0xRRGGBB values
+        values, inverse = np.unique(rgb, return_inverse=True)
+        mapped = np.empty(len(values), dtype=np.uint8)
+        for i, value in enumerate(values.tolist()):
+            index = self.indices.get(value)
+            if index is None:
+                if len(self.colors) < PALETTE_SIZE:
+                    index = len(self.colors)
+                    self.colors.append(value)
+                else:
+                    index = self.nearest(value)
+                self.indices[value] = index
+            mapped[i] = index
+        return mapped[inverse].reshape(rgb.shape)
+
+    def nearest(self, value):
+        colors = np.array(self.colors, dtype=np.int64)
+        channels = np.stack([colors >> 16, colors >> 8 & 0xff, colors & 0xff], axis=1)
+        target = np.array([value >> 16, value >> 8 & 0xff, value & 0xff])
+        return int(((channels - target) ** 2).sum(axis=1).argmin())
+
+    def to_bytes(self):
+        colors = self.colors + [0] * (PALETTE_SIZE - len(self.colors))
+        return b''.join(color.to_bytes(3, 'big') for color in colors)
+
+
+class GifWriter:
+    # Frames are kept LZW compressed in memory and the file is written on
+    # close, once the palette is complete
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self.palette = Palette()
+        self.previous = None
+        self.frames = []  # [delay in 1/100 s, image descriptor + data]
+        self.written = 0
+
+    def add(self, rgb, delay):
+        # `rgb` is a (height, width) array of 0xRRGGBB
+        if self.previous is None:
+            top, left = 0, 0
+            bottom, right = rgb.shape
+        else:
+            changed = rgb != self.previous
+            rows = np.flatnonzero(changed.any(axis=1))
+            if not len(rows):
+                self.frames[-1][0] += delay
+                return
+            columns = np.flatnonzero(changed.any(axis=0))
+            top, bottom = rows[0], rows[-1] + 1
+            left, right = columns[0], columns[-1] + 1
+        self.previous = rgb
+        indices = self.palette.quantize(rgb[top:bottom, left:right])
+        image = GIF_IMAGE.pack(0x2c, left, top, right - left, bottom - top, 0)
+        data = bytes((LZW_MIN_CODE_SIZE,)) + sub_blocks(lzw_encode(indices.tobytes()))
+        self.frames.append([delay, image + data])
+        self.written += 1
+
+    def close(self):
+        if not self.frames:
+            return
+        width, height = self.size
+        with open(self.path, 'wb') as f:
+            # Global colour table of 256 entries, 8 bits per channel
+            f.write(GIF_SCREEN.pack(b'GIF89a', width, height, 0xf7, 0, 0))
+            f.write(self.palette.to_bytes())
+            f.write(GIF_LOOP)
+            for delay, frame in self.frames:
+                # Disposal 1: the next frame is drawn over this one
+                f.write(GIF_CONTROL.pack(b'\x21\xf9\x04', 0x04, min(delay, 0xffff), 0, 0))
+                f.write(frame)
+            f.write(b'\x3b')
+
+
+def png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+class PngWriter:
+    # One PNG per frame, numbered, in the directory `path`. Unchanged frames
+    # are still written so the sequence keeps a constant frame rate.
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self.written = 0
+        os.makedirs(path, exist_ok=True)
+
+    def add(self, rgb, delay):
+        height, width = rgb.shape
+        channels = np.empty((height, width, 3), dtype=np.uint8)
+        channels[..., 0] = rgb >> 16
+        channels[..., 1] = rgb >> 8 & 0xff
+        channels[..., 2] = rgb & 0xff
+        pixels = np.zeros((height, width * 3 + 1), dtype=np.uint8)  # Each row starts with filter type 0
+        pixels[:, 1:] = channels.reshape(height, width * 3)
+        header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+        with open(os.path.join(self.path, f'frame_{self.written:05d}.png'), 'wb') as f:
+            f.write(b'\x89PNG\r\n\x1a\n' + png_chunk(b'IHDR', header) +
+                    png_chunk(b'IDAT', zlib.compress(pixels.tobytes(), 6)) + png_chunk(b'IEND', b''))
+        self.written += 1
+
+    def close(self):
+        pass
+
+
+def make_writer(path, size):
+    # A .gif path gets an animated GIF, anything else is a directory of PNGs
+    if path.lower().endswith('.gif'):
+        return GifWriter(path, size)
+    return PngWriter(path, size)
+
+
+def encode_frames(path, size, shifts, frames, results):
+    # Encoder process: turns the raw frames from `frames` into the output
+    # until it gets None, then reports (frames written, seconds spent)
+    # A forked encoder inherits SDL's handler that turns SIGTERM into a quit
+    # event, which would keep it alive at exit. Ctrl+C is for the game.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    writer = make_writer(path, size)
+    red, green, blue = shifts[:3]
+    busy = 0.0
+    while True:
+        item = frames.get()
+        if item is None:
+            break
+        start = time.perf_counter()
+        pixels, delay = item
+        # Surface pixels come (x, y) ordered in the surface's own format
+        pixels = pixels.T
+        rgb = (pixels >> red & 0xff) << 16 | (pixels >> green & 0xff) << 8 | pixels >> blue & 0xff
+        writer.add(rgb, delay)
+        busy += time.perf_counter() - start
+    start = time.perf_counter()
+    writer.close()
+    busy += time.perf_counter() - start
+    results.put((writer.written, busy))
+
+
+class FrameCapture:
+    # grab() is called once per rendered frame and keeps one every 1/fps
+    # seconds of game time; pass `delay` (1/100 s) to keep every frame with
+    # that duration instead, as the headless recorder does. drop=False waits
+    # for room in the queue instead of dropping, for when nobody is playing.
+    # The clip is the size of the first frame; frames of another size (the
+    # window reopened for a different board) are skipped.
+    def __init__(self, path, fps=CAPTURE_FPS, queue_frames=QUEUE_FRAMES, drop=True):
+        self.path = path
+        self.size = None
+        self.interval = 1.0 / fps
+        self.drop = drop
+        self.frames = multiprocessing.Queue(queue_frames)
+        # Without close() nothing reads the frames any more; exiting must not wait on them
+        self.frames.cancel_join_thread()
+        self.results = multiprocessing.Queue()
+        self.process = None
+        self.grabbed = 0
+        self.dropped = 0
+        self.grab_time = 0.0
+        self.started = None
+        self.last = None
+        self.pending = 0.0  # Game time since the last kept frame, in 1/100 s
+
+    def grab(self, surface, delay=None):
+        now = time.perf_counter()
+        if self.process is None:
+            # Started on the first frame, once the surface size and format are known
+            self.size = surface.get_size()
+            self.process = multiprocessing.Process(
+                target=encode_frames, args=(self.path, self.size, surface.get_shifts(), self.frames, self.results),
+                daemon=True)
+            self.process.start()
+            self.started = now
+        if delay is None:
+            if self.last is not None and now - self.last < self.interval:
+                return False
+            # Rounding leftovers carry over, so the clip keeps real time; a
+            # pause for a menu shows as at most MAX_PAUSE seconds
+            self.pending += min(now - self.last, MAX_PAUSE) * 100 if self.last is not None else self.interval * 100
+            self.last = now
+            delay = int(self.pending)
+            self.pending -= delay
+        if surface.get_size() != self.size:
+            return False
+        pixels = np.array(surface.get_view('2'), copy=True)
+        try:
+            self.frames.put((pixels, max(delay, 1)), block=not self.drop)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        finally:
+            self.grab_time += time.perf_counter() - now
+        self.grabbed += 1
+        return True
+
+    def close(self):
+        # Waits for the encoder to finish the file and returns report lines
+        if self.process is None:
+            return ['Capture: no frames']
+        elapsed = time.perf_counter() - self.started
+        self.frames.put(None)
+        written, busy = self.results.get()
+        self.process.join()
+        lines = [
+            f'Capture: {written} frames written to {self.path} ({self.grabbed} grabbed, {self.dropped} dropped)',
+            f'Grab: {self.grabbed / elapsed:,.1f} frames/sec, {self.grab_time / max(self.grabbed + self.dropped, 1) * 1000:.2f}ms per frame',
+            f'Encode: {self.grabbed / busy:,.1f} frames/sec' if busy > 0 else 'Encode: n/a',
+        ]
+        if os.path.isfile(self.path):
+            lines.append(f'Output: {os.path.getsize(self.path) / 1024:,.1f} KiB')
+        return lines
+
+
+def record(path, games=1, seed=0, policy='greedy', board_size=BOARD_SIZE, max_ticks=2000, cell_size=30,
+           window=600, mode='medium'):
+    # Plays seeded games with no window (SDL's dummy driver) and captures one
+    # frame per tick, timed at the mode's tick rate. Prints the throughput.
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+    pygame.font.init()
+    screen_size = min(board_size * cell_size, window)
+    screen = pygame.display.set_mode((screen_size, screen_size))
+    atlas = SpriteAtlas(cell_size)
+    atlas.use_skin(SNAKE_COLORS[0])
+    capture = FrameCapture(path, drop=False)
+    delay = round(100 / TICK_RATES.get(mode, TICK_RATES['medium']))
+    ticks = 0
+    start = time.perf_counter()
+    for game_seed in range(seed, seed + games):
+        game = GameState(board_size, game_seed)
+        game_policy = make_policy(policy, game_seed)
+        renderer = make_renderer(screen, atlas, board_size, cell_size, grid=(mode == 'easy'))
+        while True:
+            hud = render_text(f'Seed {game_seed}  Apples: {game.apple_count}', 36, (255, 255, 255))
+            renderer.draw(game, [(hud, (10, 10))])
+            capture.grab(screen, delay)
+            if game.status != 'running' or game.ticks >= max_ticks:
+                break
+            game.step(game_policy(game))
+            ticks += 1
+    elapsed = time.perf_counter() - start
+    print(f'Games recorded: {games}, {ticks} ticks in {elapsed:.3f}s')
+    for line in capture.close():
+        print(line)
+    pygame.quit()
+    return capture
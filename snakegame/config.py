@@ -0,0 +1,64 @@
+# Constants shared by the pygame front end, the renderers and the headless tools
+
+BOARD_SIZE = 20
+MIN_BOARD_SIZE = 10
+MAX_BOARD_SIZE = 500
+SNAKE_START_LENGTH = 3
+
+# Directions
+UP = (0, -1)
+DOWN = (0, 1)
+LEFT = (-1, 0)
+RIGHT = (1, 0)
+INITIAL_DIRECTION = RIGHT  # Moving right initially
+MOVES = (UP, DOWN, LEFT, RIGHT)  # Action order used by policies, replays and the batch env
+
+# Simulation ticks per second for each mode, independent of the frame rate
+TICK_RATES = {
+    'easy': 10,
+    'medium': 10,
+    'hard': 15,
+    'autopilot': 20,
+    'swarm': 10,
+}
+
+# Swarm mode: many apples at once plus power-ups that come and go
+SWARM_DENSITY = 0.02  # Share of the board's cells holding an apple
+POWER_UP_INTERVAL = 50  # Ticks between power-ups appearing
+POWER_UP_LIFETIME = 150  # Ticks a power-up stays on the board if nobody takes it
+POWER_UPS = {
+    'slow': {'color': (0, 128, 255), 'duration': 80},  # Half speed
+    'diet': {'color': (255, 255, 255), 'duration': 100},  # Apples don't make the snake longer
+}
+SLOW_FACTOR = 2  # How much longer a tick takes while 'slow' is active
+
+APPLE_COLOR = (255, 0, 0)  # Red
+BACKGROUND_COLOR = (0, 0, 0)  # Black
+GRID_COLOR = (200, 200, 200)  # Light grey
+
+# Define 12 colors for the snake, including green as default
+SNAKE_COLORS = [
+    (0, 255, 0),     # Green (default)
+    (0, 0, 255),     # Blue
+    (255, 255, 0),   # Yellow
+    (255, 165, 0),   # Orange
+    (128, 0, 128),   # Purple
+    (0, 255, 255),   # Cyan
+    (255, 192, 203), # Pink
+    (165, 42, 42),   # Brown
+    (255, 215, 0),   # Gold
+    (0, 128, 128),   # Teal
+    (255, 105, 180), # Hot Pink
+    (64, 224, 208)   # Turquoise
+]
+
+# Special skins unlocked by games played milestones. Skin files in skins/
+# use the same fields; head_color defaults to color and style to 'solid'.
+SPECIAL_SKINS = {
+    'yellow_hollow': {'type': 'special', 'name': 'Yellow Hollow', 'id': 'yellow_hollow',
+                      'color': (255, 255, 0), 'style': 'hollow', 'unlock_games': 5},
+    'red_hollow': {'type': 'special', 'name': 'Red Hollow', 'id': 'red_hollow',
+                   'color': (255, 0, 0), 'head_color': (153, 0, 0), 'style': 'hollow', 'unlock_games': 10},
+    'purple_hollow': {'type': 'special', 'name': 'Purple Hollow', 'id': 'purple_hollow',
+                      'color': (128, 0, 128), 'style': 'hollow', 'unlock_games': 15}
+}
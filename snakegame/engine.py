@@ -0,0 +1,111 @@
+from collections import deque
+
+
+class FreeCells:
+    # Indexable set of the cells the snake does not cover. Cells are stored as
+    # y * board_size + x in a flat list; removing one swaps the last entry into
+    # its slot, so add, discard and a uniform random pick are all O(1).
+    def __init__(self, board_size):
+        self.board_size = board_size
+        count = board_size * board_size
+        self.cells = list(range(count))
+        self.slots = list(range(count))  # slots[cell] is its index in cells, or -1
+
+    @classmethod
+    def from_cells(cls, board_size, cells):
+        # Rebuilds one with exactly this order, which decides what choice() picks
+        free = cls.__new__(cls)
+        free.board_size = board_size
+        free.cells = list(cells)
+        free.slots = [-1] * (board_size * board_size)
+        for slot, cell in enumerate(free.cells):
+            free.slots[cell] = slot
+        return free
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, cell):
+        return self.slots[cell] >= 0
+
+    def add(self, cell):
+        if self.slots[cell] < 0:
+            self.slots[cell] = len(self.cells)
+            self.cells.append(cell)
+
+    def discard(self, cell):
+        slot = self.slots[cell]
+        if slot < 0:
+            return
+        last = self.cells.pop()
+        if last != cell:
+            self.cells[slot] = last
+            self.slots[last] = slot
+        self.slots[cell] = -1
+
+    def choice(self, rng):
+        # Returns an (x, y) cell, or None when the board is full
+        if not self.cells:
+            return None
+        y, x = divmod(self.cells[rng.randrange(len(self.cells))], self.board_size)
+        return (x, y)
+
+
+class Snake:
+    # The body lives in a deque (head first) and is mirrored in a bytearray
+    # occupancy grid indexed by y * board_size + x, so moving, growing and
+    # collision checks cost the same for a 3-cell snake and a full board.
+    def __init__(self, board_size, segments):
+        self.board_size = board_size
+        self.body = deque(segments)
+        self.grid = bytearray(board_size * board_size)
+        self.free = FreeCells(board_size)
+        for x, y in self.body:
+            self.grid[y * board_size + x] = 1
+            self.free.discard(y * board_size + x)
+        self.pending_growth = 0
+        self.collided = False
+        self.vacated = None  # Cell the tail left on the last move, if any
+
+    def __iter__(self):
+        return iter(self.body)
+
+    def __len__(self):
+        return len(self.body) + self.pending_growth
+
+    @property
+    def head(self):
+        return self.body[0]
+
+    @property
+    def tail(self):
+        return self.body[-1]
+
+    def is_free(self, cell):
+        return not self.grid[cell[1] * self.board_size + cell[0]]
+
+    def grow(self, amount=1):
+        # The tail stays put for the next `amount` moves
+        self.pending_growth += amount
+
+    def advance(self, direction):
+        size = self.board_size
+        head_x, head_y = self.body[0]
+        new_head = ((head_x + direction[0]) % size, (head_y + direction[1]) % size)
+
+        # The tail moves out of the way first, so following it is allowed
+        if self.pending_growth:
+            self.pending_growth -= 1
+            self.vacated = None
+        else:
+            tail_x, tail_y = self.body.pop()
+            self.grid[tail_y * size + tail_x] = 0
+            self.free.add(tail_y * size + tail_x)
+            self.vacated = (tail_x, tail_y)
+
+        index = new_head[1] * size + new_head[0]
+        self.collided = self.grid[index] == 1
+        self.grid[index] = 1
+        self.free.discard(index)
+        self.body.appendleft(new_head)
+        return new_head
@@ -0,0 +1,85 @@
+import random
+from collections import deque
+
+from snakegame.config import BOARD_SIZE, SNAKE_START_LENGTH, INITIAL_DIRECTION
+from snakegame.engine import Snake
+
+
+def start_segments(board_size, length=SNAKE_START_LENGTH, direction=INITIAL_DIRECTION):
+    # Head in the middle of the board with the body trailing behind it
+    center = board_size // 2
+    return [
+        ((center - direction[0] * i) % board_size, (center - direction[1] * i) % board_size)
+        for i in range(length)
+    ]
+
+
+class GameState:
+    # All of the rules of a single game with no pygame or file access, so the
+    # same core drives the window, headless runs and any tooling around them.
+    items = None  # Swarm games (swarm.SwarmState) keep their apples and power-ups here
+
+    def __init__(self, board_size=BOARD_SIZE, seed=None):
+        self.board_size = board_size
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.reset()
+
+    def reset(self):
+        self.snake = Snake(self.board_size, start_segments(self.board_size))
+        self.direction = INITIAL_DIRECTION
+        self.apple = self.spawn_apple()
+        self.apple_count = 0
+        self.ticks = 0
+        self.status = 'running'  # 'running', 'dead' or 'cleared'
+        self.ate_apple = False
+
+    def spawn_apple(self):
+        # Returns None once the snake covers every cell
+        return self.snake.free.choice(self.rng)
+
+    def can_turn(self, direction):
+        # The snake can't reverse straight into itself
+        return (direction[0] + self.direction[0] != 0) or (direction[1] + self.direction[1] != 0)
+
+    def step(self, action=None):
+        if action is not None and self.can_turn(action):
+            self.direction = action
+
+        new_head = self.snake.advance(self.direction)
+        self.ticks += 1
+        self.ate_apple = False
+
+        if self.snake.collided:
+            self.status = 'dead'
+        elif new_head == self.apple:
+            self.snake.grow()
+            self.apple_count += 1
+            self.ate_apple = True
+            self.apple = self.spawn_apple()
+            if self.apple is None:
+                self.status = 'cleared'
+        return self.status
+
+
+class InputBuffer:
+    # Turns pressed between two ticks are queued instead of overwriting each
+    # other, and applied one per tick. Each is checked against the direction
+    # at the tick it is applied, so UP then LEFT while moving right both land.
+    def __init__(self, size=3):
+        self.size = size
+        self.turns = deque()
+
+    def push(self, direction):
+        if len(self.turns) < self.size and (not self.turns or self.turns[-1] != direction):
+            self.turns.append(direction)
+
+    def pop(self, state):
+        while self.turns:
+            direction = self.turns.popleft()
+            if direction != state.direction and state.can_turn(direction):
+                return direction
+        return None
+
+    def clear(self):
+        self.turns.clear()
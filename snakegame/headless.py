@@ -0,0 +1,61 @@
+import os
+import time
+
+from snakegame.config import BOARD_SIZE
+from snakegame.replay import Replay, verify
+from snakegame.selfplay import SelfPlayStats, run_selfplay
+from snakegame.snapshot import loads
+
+
+def run(games, seed=0, policy='random', workers=1, board_size=BOARD_SIZE, max_ticks=100000, snapshot=None,
+        heatmaps=None):
+    # Plays `games` seeded games with no window or frame cap, spread over
+    # `workers` processes, and prints the merged totals. With a `snapshot`
+    # file every game carries on from the game saved in it. With `heatmaps`
+    # (a HeatmapStore) the games' heatmaps are added to its 'headless' one.
+    start_game = None
+    if snapshot is not None:
+        with open(snapshot, 'rb') as f:
+            start_game = f.read()
+        loads(start_game)  # A bad file fails here instead of in every worker
+    stats = SelfPlayStats()
+    start = time.perf_counter()
+    if heatmaps is None:
+        for result in run_selfplay(games, seed, policy, workers, board_size, max_ticks, start=start_game):
+            stats.add(result)
+    else:
+        from snakegame.heatmap import run_batches
+        heatmap = heatmaps.get(board_size, 'headless')
+        for results, counts in run_batches(games, seed, policy, workers, board_size, max_ticks, start_game):
+            for result in results:
+                stats.add(result)
+            heatmap.merge(counts)
+        heatmaps.flush()
+    elapsed = time.perf_counter() - start
+
+    print(f'Games played: {stats.games}')
+    print(f'Total ticks: {stats.ticks}')
+    print(f'Total apples: {stats.apples} (best game: {stats.best_apples})')
+    print(f'Longest snake: {stats.longest}')
+    print('Death causes: ' + ', '.join(f'{cause} {count}' for cause, count in sorted(stats.death_causes.items())))
+    print(f'Elapsed: {elapsed:.3f}s')
+    print(f'Ticks/sec: {stats.ticks / elapsed:,.0f}' if elapsed > 0 else 'Ticks/sec: n/a')
+    if heatmaps is not None:
+        print(f'Heatmaps: added to {heatmaps.path(board_size, "headless")}')
+    return stats, elapsed
+
+
+def check_replay(path):
+    # Fast-forwards a replay with no rendering and checks it ends where it was recorded
+    replay = Replay.load(path)
+    start = time.perf_counter()
+    valid = verify(replay)
+    elapsed = time.perf_counter() - start
+
+    print(f'Replay: {path} ({os.path.getsize(path)} bytes, {len(replay.turns)} turns)')
+    print(f'Mode: {replay.mode or "unknown"}, board {replay.board_size}x{replay.board_size}, seed {replay.seed}')
+    print(f'Recorded result: {replay.apple_count} apples, {replay.status} after {replay.ticks} ticks')
+    print(f'Verified: {"yes" if valid else "NO, the re-simulated game ends differently"}')
+    print(f'Elapsed: {elapsed:.3f}s')
+    print(f'Ticks/sec: {replay.ticks / elapsed:,.0f}' if elapsed > 0 else 'Ticks/sec: n/a')
+    return valid
@@ -0,0 +1,150 @@
+import multiprocessing
+import os
+
+import numpy as np
+import pygame
+
+from snakegame.config import BOARD_SIZE
+from snakegame.policies import make_policy
+from snakegame.selfplay import game_result, play_game
+
+# Where games went on the board, per board size and mode: how often the head
+# entered each cell, where apples were eaten and where the snake ran into
+# itself. Each is a (size, size) count indexed [y, x], and the three sit in
+# one (3, size, size) uint32 array, so combining any number of heatmaps is
+# one vectorized sum. Counts wrap past 2**32 per cell.
+LAYERS = ('visits', 'apples', 'deaths')
+DTYPE = np.uint32
+
+# Headless games played per pool job; each job sends back one array
+BATCH_GAMES = 256
+
+
+def heat_colors():
+    # Black through red and yellow to white, indexed by heat 0-255
+    heat = np.linspace(0.0, 3.0, 256)
+    channels = np.clip(np.stack([heat, heat - 1, heat - 2], axis=1), 0.0, 1.0)
+    return (channels * 255).astype(np.uint8)
+
+
+HEAT_COLORS = heat_colors()
+
+
+class Heatmap:
+    def __init__(self, board_size=BOARD_SIZE, counts=None):
+        self.board_size = board_size
+        self.counts = np.zeros((len(LAYERS), board_size, board_size), DTYPE) if counts is None else counts
+        # Flat per-layer views of the same memory, so a tick is a few scalar increments
+        flat = self.counts.view(np.ndarray).reshape(len(LAYERS), board_size * board_size)
+        self.visits, self.apples, self.deaths = flat
+
+    @classmethod
+    def open(cls, path, board_size):
+        # Memory-maps the .npy file at `path`, creating it (all zeros) if it
+        # doesn't exist or doesn't hold a heatmap of this size
+        shape = (len(LAYERS), board_size, board_size)
+        if os.path.exists(path):
+            try:
+                counts = np.lib.format.open_memmap(path, mode='r+')
+            except ValueError:
+                counts = None  # Not a .npy file
+            if counts is not None and counts.shape == shape and counts.dtype == DTYPE:
+                return cls(board_size, counts)
+            counts = None  # Unmapped before the file is started over
+        return cls(board_size, np.lib.format.open_memmap(path, mode='w+', dtype=DTYPE, shape=shape))
+
+    def record(self, state):
+        # Called after every tick of `state`
+        x, y = state.snake.head
+        cell = y * self.board_size + x
+        self.visits[cell] += 1
+        if state.ate_apple:
+            self.apples[cell] += 1
+        if state.status == 'dead':
+            self.deaths[cell] += 1
+
+    def merge(self, counts):
+        # Adds another heatmap's counts (a Heatmap or its array) of the same board size
+        self.counts += counts.counts if isinstance(counts, Heatmap) else counts
+
+    def flush(self):
+        if isinstance(self.counts, np.memmap):
+            self.counts.flush()
+
+    def render(self, layer, width):
+        # A width x width surface of one layer, the busiest cell white. Heat is
+        # logarithmic so a cell visited a few times still shows next to one
+        # visited thousands of times.
+        counts = self.counts[LAYERS.index(layer)]
+        top = counts.max()
+        if top:
+            heat = (np.log1p(counts) * (255 / np.log1p(top))).astype(np.uint8)
+        else:
+            heat = np.zeros(counts.shape, np.uint8)
+        # surfarray wants [x, y]
+        surface = pygame.surfarray.make_surface(HEAT_COLORS[heat.T])
+        return pygame.transform.scale(surface, (width, width))
+
+
+def combine(heatmaps):
+    # One Heatmap with the counts of all of `heatmaps` (same board size), summed in one go
+    heatmaps = list(heatmaps)
+    return Heatmap(heatmaps[0].board_size, np.sum([h.counts for h in heatmaps], axis=0, dtype=DTYPE))
+
+
+class HeatmapStore:
+    # A memory-mapped file per (board size, mode) in `directory`, named
+    # {mode}-{size}.npy, opened on first use
+    def __init__(self, directory='heatmaps'):
+        self.directory = directory
+        self.heatmaps = {}
+
+    def path(self, board_size, mode):
+        return os.path.join(self.directory, f'{mode}-{board_size}.npy')
+
+    def get(self, board_size, mode):
+        key = (board_size, mode)
+        heatmap = self.heatmaps.get(key)
+        if heatmap is None:
+            os.makedirs(self.directory, exist_ok=True)
+            heatmap = self.heatmaps[key] = Heatmap.open(self.path(board_size, mode), board_size)
+        return heatmap
+
+    def modes(self, board_size):
+        # Modes with a heatmap for this board size, on disk or open
+        suffix = f'-{board_size}.npy'
+        modes = {mode for size, mode in self.heatmaps if size == board_size}
+        if os.path.isdir(self.directory):
+            modes.update(name[:-len(suffix)] for name in os.listdir(self.directory) if name.endswith(suffix))
+        return sorted(modes)
+
+    def flush(self):
+        for heatmap in self.heatmaps.values():
+            heatmap.flush()
+
+
+def play_batch(job):
+    # Worker entry point: plays a run of seeds into one Heatmap and sends its
+    # counts back with the results, one array for the whole batch
+    first_seed, count, policy_spec, board_size, max_ticks, start = job
+    heatmap = Heatmap(board_size)
+    results = []
+    for seed in range(first_seed, first_seed + count):
+        state = play_game(seed, make_policy(policy_spec, seed), board_size, max_ticks, start, heatmap.record)
+        results.append(game_result(seed, state))
+    return results, heatmap.counts
+
+
+def run_batches(games, seed=0, policy='random', workers=None, board_size=BOARD_SIZE, max_ticks=100000, start=None,
+                batch_games=None):
+    # Like selfplay.run_selfplay, but yields (results, counts) per batch of games
+    workers = workers or os.cpu_count() or 1
+    batch_games = batch_games or max(1, min(BATCH_GAMES, games // (workers * 8)))
+    jobs = [(first, min(batch_games, seed + games - first), policy, board_size, max_ticks, start)
+            for first in range(seed, seed + games, batch_games)]
+    if workers == 1:
+        for job in jobs:
+            yield play_batch(job)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap_unordered(play_batch, jobs)
@@ -0,0 +1,121 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+
+def write_json_atomic(path, data):
+    # Write to a temp file next to the target and rename it over the old one,
+    # so a crash mid-write leaves either the old file or the new one
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class AsyncSaver:
+    # Takes JSON snapshots from the game thread and writes them from a
+    # background thread. Saves that arrive within `interval` seconds of the
+    # first unsaved one are coalesced into a single write of the newest
+    # snapshot. Whatever is still pending gets written at exit.
+    def __init__(self, path, interval=1.0):
+        self.path = path
+        self.interval = interval
+        self._pending = None
+        self._dirty_since = None
+        self._closed = False
+        self._writing = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+        # Flush metrics
+        self.requests = 0
+        self.flushes = 0
+        self.errors = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+
+    def save(self, data):
+        # `data` must not be mutated by the caller afterwards
+        with self._cond:
+            if self._closed:
+                write_json_atomic(self.path, data)
+                return
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='data-saver', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+            self.requests += 1
+            self._pending = data
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+            self._cond.notify_all()
+
+    def flush(self):
+        # Blocks until everything handed to save() so far is on disk
+        with self._cond:
+            if self._pending is not None:
+                self._dirty_since = 0.0  # Deadline already passed
+            self._cond.notify_all()
+            errors = self.errors
+            while self._pending is not None or self._writing:
+                if self._thread is None or not self._thread.is_alive() or self.errors != errors:
+                    break
+                self._cond.wait()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                while self._pending is not None and not self._closed:
+                    remaining = self._dirty_since + self.interval - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                data, self._pending = self._pending, None
+                self._dirty_since = None
+                self._writing = data is not None
+                closed = self._closed
+
+            if data is not None:
+                start = time.perf_counter()
+                try:
+                    write_json_atomic(self.path, data)
+                    failed = False
+                except OSError:
+                    failed = True
+                latency = time.perf_counter() - start
+                with self._cond:
+                    self._writing = False
+                    if failed:
+                        # Keep the snapshot for the next attempt unless a newer one arrived
+                        self.errors += 1
+                        if self._pending is None and not closed:
+                            self._pending = data
+                            self._dirty_since = time.monotonic()
+                    else:
+                        self.flushes += 1
+                        self.last_latency = latency
+                        self.max_latency = max(self.max_latency, latency)
+                        self.total_latency += latency
+                    self._cond.notify_all()
+            if closed:
+                return
+
+    def report(self):
+        average = self.total_latency / self.flushes if self.flushes else 0.0
+        return (f'Saves: {self.requests} requested, {self.flushes} written, '
+                f'flush latency last {self.last_latency * 1000:.2f}ms, '
+                f'avg {average * 1000:.2f}ms, max {self.max_latency * 1000:.2f}ms')
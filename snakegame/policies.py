@@ -0,0 +1,82 @@
+import importlib
+import random
+
+from snakegame.autopilot import AutopilotPolicy
+from snakegame.config import MOVES, UP, DOWN, LEFT, RIGHT
+
+
+class RandomPolicy:
+    # Wanders randomly but avoids stepping straight into its own body when a
+    # free neighbour exists. It has its own RNG so apple placement only depends
+    # on the game seed.
+    def __init__(self, seed=None, turn_chance=0.2):
+        self.rng = random.Random(seed)
+        self.turn_chance = turn_chance
+
+    def __call__(self, state):
+        snake = state.snake
+        size = state.board_size
+        head_x, head_y = snake.head
+        ahead = ((head_x + state.direction[0]) % size, (head_y + state.direction[1]) % size)
+        if snake.is_free(ahead) and self.rng.random() >= self.turn_chance:
+            return None
+        options = []
+        for move in MOVES:
+            if not state.can_turn(move):
+                continue
+            cell = ((head_x + move[0]) % size, (head_y + move[1]) % size)
+            if snake.is_free(cell) or (cell == snake.tail and not snake.pending_growth):
+                options.append(move)
+        if not options:
+            return None
+        return self.rng.choice(options)
+
+
+class GreedyPolicy:
+    # Heads for the apple along the shorter way around each axis of the torus
+    # and only falls back to any safe move when the direct ones are blocked.
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def __call__(self, state):
+        snake = state.snake
+        size = state.board_size
+        if state.apple is None:
+            return None
+        head_x, head_y = snake.head
+        dx = (state.apple[0] - head_x) % size
+        dy = (state.apple[1] - head_y) % size
+        preferred = []
+        if dx:
+            preferred.append(RIGHT if dx <= size // 2 else LEFT)
+        if dy:
+            preferred.append(DOWN if dy <= size // 2 else UP)
+        others = [move for move in MOVES if move not in preferred]
+        self.rng.shuffle(others)
+
+        for move in preferred + others:
+            if not state.can_turn(move):
+                continue
+            cell = ((head_x + move[0]) % size, (head_y + move[1]) % size)
+            if snake.is_free(cell) or (cell == snake.tail and not snake.pending_growth):
+                return move
+        return None
+
+
+POLICIES = {
+    'random': RandomPolicy,
+    'greedy': GreedyPolicy,
+    'autopilot': AutopilotPolicy,
+}
+
+
+def make_policy(spec, seed=None):
+    # `spec` is a built-in policy name or 'module:factory', where factory(seed)
+    # returns a callable mapping a GameState to a direction (or None to keep going)
+    if spec in POLICIES:
+        return POLICIES[spec](seed)
+    if ':' not in spec:
+        raise ValueError(f'Unknown policy {spec!r}, expected one of {sorted(POLICIES)} or module:factory')
+    module_name, factory_name = spec.split(':', 1)
+    factory = getattr(importlib.import_module(module_name), factory_name)
+    return factory(seed)
@@ -0,0 +1,108 @@
+import json
+import time
+from collections import deque
+from contextlib import nullcontext
+
+_NULL_PHASE = nullcontext()
+
+
+class _Phase:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+
+
+class FrameProfiler:
+    # Times the phases of the game loop. While disabled phase() hands back a
+    # shared no-op context manager, so instrumented code costs one call per
+    # phase. Timings for the last `history` frames feed the overlay; with
+    # tracing on every phase is also kept as a Chrome trace event
+    # (chrome://tracing or Perfetto can open the dump).
+    def __init__(self, history=240, max_trace_events=1000000):
+        self.show_overlay = False
+        self.tracing = False
+        self.enabled = False
+        self.frame_times = deque(maxlen=history)
+        self.phase_history = deque(maxlen=history)
+        self.current = {}
+        self.frame_start = None
+        self.max_trace_events = max_trace_events
+        self.trace_events = []
+        self.origin = time.perf_counter()
+
+    def _update_enabled(self):
+        self.enabled = self.show_overlay or self.tracing
+        if not self.enabled:
+            self.frame_start = None
+
+    def toggle_overlay(self):
+        self.show_overlay = not self.show_overlay
+        self._update_enabled()
+
+    def start_trace(self):
+        self.tracing = True
+        self._update_enabled()
+
+    def phase(self, name):
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def record(self, name, start, end):
+        self.current[name] = self.current.get(name, 0.0) + end - start
+        if self.tracing and len(self.trace_events) < self.max_trace_events:
+            self.trace_events.append({
+                'name': name, 'ph': 'X', 'pid': 0, 'tid': 0,
+                'ts': (start - self.origin) * 1e6, 'dur': (end - start) * 1e6,
+            })
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            # Frame time is start to start, so it includes the wait for vsync/clock
+            self.frame_times.append(now - self.frame_start)
+            self.phase_history.append(self.current)
+            if self.tracing and len(self.trace_events) < self.max_trace_events:
+                self.trace_events.append({
+                    'name': 'frame', 'ph': 'X', 'pid': 0, 'tid': 1,
+                    'ts': (self.frame_start - self.origin) * 1e6, 'dur': (now - self.frame_start) * 1e6,
+                })
+        self.current = {}
+        self.frame_start = now
+
+    def percentile(self, fraction):
+        if not self.frame_times:
+            return 0.0
+        ordered = sorted(self.frame_times)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary_lines(self):
+        if not self.frame_times:
+            return ['Profiling...']
+        total = sum(self.frame_times)
+        lines = [
+            f'FPS {len(self.frame_times) / total:.0f}',
+            f'frame p50 {self.percentile(0.5) * 1000:.2f}ms  p99 {self.percentile(0.99) * 1000:.2f}ms',
+        ]
+        phases = {}
+        for frame in self.phase_history:
+            for name, duration in frame.items():
+                phases[name] = phases.get(name, 0.0) + duration
+        frames = len(self.phase_history)
+        for name, duration in sorted(phases.items(), key=lambda item: -item[1]):
+            lines.append(f'{name} {duration / frames * 1000:.3f}ms')
+        return lines
+
+    def dump_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.trace_events, 'displayTimeUnit': 'ms'}, f)
@@ -0,0 +1,331 @@
+import pygame
+
+from snakegame.config import BACKGROUND_COLOR, GRID_COLOR
+from snakegame.profiler import FrameProfiler
+from snakegame.swarm import ITEM_KINDS
+
+
+def draw_grid(surface, board_size, cell_size):
+    screen_size = board_size * cell_size
+    for x in range(0, screen_size, cell_size):
+        pygame.draw.line(surface, GRID_COLOR, (x, 0), (x, screen_size))
+    for y in range(0, screen_size, cell_size):
+        pygame.draw.line(surface, GRID_COLOR, (0, y), (screen_size, y))
+
+
+def wrapped_step(a, b, board_size):
+    # -1, 0 or 1: the single step along one axis that leads from a to b on the torus
+    return (b - a + 1) % board_size - 1
+
+
+class BoardRenderer:
+    # Keeps a persistent background (grid included) and only repaints the
+    # cells that can change: the cell the tail left, the previous and new
+    # head, the tail, the apple, the text drawn over the board and whatever
+    # was painted the frame before. The changed rects go out through display.update(), so a
+    # frame costs the same for any snake length. full_redraw=True repaints
+    # everything each frame and flips, for debugging. `screen` may be a
+    # subsurface of the window; the rects are moved to window coordinates.
+    #
+    # `alpha` is how far the clock is between the last tick and the next one;
+    # the head and tail are drawn that far along their last move, so movement
+    # looks smooth at any frame rate while the body stays on its cells.
+    #
+    # Swarm games have their items painted into `layer`, a copy of the
+    # background, which only ever has the cells whose item came or went
+    # repainted. Everything that used to show the background shows the layer.
+    def __init__(self, screen, atlas, board_size, cell_size, grid=False, full_redraw=False, profiler=None):
+        self.screen = screen
+        self.atlas = atlas
+        self.board_size = board_size
+        self.cell_size = cell_size
+        self.full_redraw = full_redraw
+        self.profiler = profiler or FrameProfiler()
+        self.offset = screen.get_abs_offset()
+        self.background = pygame.Surface(screen.get_size()).convert()
+        self.background.fill(BACKGROUND_COLOR)
+        if grid:
+            with self.profiler.phase('draw_grid'):
+                draw_grid(self.background, board_size, cell_size)
+        self.reset()
+
+    def reset(self):
+        # Forces a full repaint on the next frame, e.g. after a menu was shown
+        self.ticks = None
+        self.head = None
+        self.prev_head = None
+        self.text_rects = []
+        self.last_cells = ()
+        self.items = None
+        self.layer = self.background
+
+    def cell_rect(self, cell):
+        return pygame.Rect(cell[0] * self.cell_size, cell[1] * self.cell_size, self.cell_size, self.cell_size)
+
+    def draw(self, game, texts, alpha=1.0):
+        # `texts` is a list of (surface, position) pairs drawn over the board,
+        # such as the score
+        with self.profiler.phase('draw'):
+            dirty = self._draw_board(game, texts, alpha)
+        with self.profiler.phase('flip'):
+            if dirty is None:
+                pygame.display.flip()
+            else:
+                if self.offset != (0, 0):
+                    dirty = [rect.move(self.offset) for rect in dirty]
+                pygame.display.update(dirty)
+
+    def _draw_board(self, game, texts, alpha):
+        snake = game.snake
+        # Interpolation needs the head from one tick earlier, which is only
+        # known when no tick was skipped since the last frame
+        if self.ticks is not None and game.ticks == self.ticks + 1:
+            self.prev_head = self.head
+        elif self.ticks != game.ticks:
+            self.prev_head = None
+        sliding = self.prev_head is not None and alpha < 1.0
+
+        cells = {snake.head, snake.tail}
+        if self.prev_head is not None:
+            cells.add(self.prev_head)
+        if snake.vacated is not None:
+            cells.add(snake.vacated)
+        if game.apple is not None:
+            cells.add(game.apple)
+        if game.items is not None:
+            self._update_layer(game.items, cells)
+        text_rects = [surface.get_rect(topleft=pos) for surface, pos in texts]
+        for rect in text_rects + self.text_rects:
+            cells.update(self._cells_under(rect))
+
+        if self.full_redraw or self.ticks is None or game.ticks - self.ticks not in (0, 1):
+            self._draw_full(game, sliding)
+            dirty = None
+        else:
+            # Last frame's cells too, to wipe the sprites slid across them
+            dirty = [self._paint_cell(game, cell, sliding) for cell in cells.union(self.last_cells)]
+
+        if sliding:
+            if snake.vacated is not None:
+                self._slide(self.atlas.body, snake.vacated, snake.tail, alpha)
+            self._slide(self.atlas.head, self.prev_head, snake.head, alpha)
+        self.screen.blits(texts, doreturn=False)
+
+        self.ticks = game.ticks
+        self.head = snake.head
+        self.text_rects = text_rects
+        self.last_cells = cells
+        return dirty
+
+    def _update_layer(self, items, cells):
+        size = self.board_size
+        if items is not self.items:
+            # A new game: paint every item once and repaint the screen in full
+            self.items = items
+            self.item_sprites = [None] + [self.atlas.get(None, kind) for kind in ITEM_KINDS]
+            self.layer = self.background.copy()
+            changed = [cell for cell, _ in items]
+            self.ticks = None
+        else:
+            changed = items.changed
+        for index in changed:
+            y, x = divmod(index, size)
+            rect = self.cell_rect((x, y))
+            self.layer.blit(self.background, rect, rect)
+            if items.kinds[index]:
+                self.layer.blit(self.item_sprites[items.kinds[index]], rect)
+            cells.add((x, y))
+        items.changed = []  # Also starts the queue for a grid seen the first time
+
+    def _cells_under(self, rect):
+        cell_size = self.cell_size
+        last = self.board_size - 1
+        return [
+            (x, y)
+            for y in range(rect.top // cell_size, min((rect.bottom - 1) // cell_size, last) + 1)
+            for x in range(rect.left // cell_size, min((rect.right - 1) // cell_size, last) + 1)
+        ]
+
+    def _draw_full(self, game, sliding):
+        screen = self.screen
+        cell_size = self.cell_size
+        atlas = self.atlas
+        screen.blit(self.layer, (0, 0))
+        segments = iter(game.snake)
+        head_x, head_y = next(segments)
+        if not sliding:
+            screen.blit(atlas.head, (head_x * cell_size, head_y * cell_size))
+        screen.blits([(atlas.body, (x * cell_size, y * cell_size)) for x, y in segments], doreturn=False)
+        if game.apple is not None:
+            screen.blit(atlas.apple, (game.apple[0] * cell_size, game.apple[1] * cell_size))
+
+    def _paint_cell(self, game, cell, sliding):
+        # Background first so hollow skins don't keep what was under them
+        rect = self.cell_rect(cell)
+        self.screen.blit(self.layer, rect, rect)
+        if cell == game.snake.head:
+            if not sliding:
+                self.screen.blit(self.atlas.head, rect)
+        elif not game.snake.is_free(cell):
+            self.screen.blit(self.atlas.body, rect)
+        elif cell == game.apple:
+            self.screen.blit(self.atlas.apple, rect)
+        return rect
+
+    def _slide(self, sprite, from_cell, to_cell, alpha):
+        size = self.board_size
+        cell_size = self.cell_size
+        step_x = wrapped_step(from_cell[0], to_cell[0], size)
+        step_y = wrapped_step(from_cell[1], to_cell[1], size)
+        offset_x = round(step_x * alpha * cell_size)
+        offset_y = round(step_y * alpha * cell_size)
+        self.screen.blit(sprite, (from_cell[0] * cell_size + offset_x, from_cell[1] * cell_size + offset_y))
+        if (from_cell[0] + step_x, from_cell[1] + step_y) != to_cell:
+            # The move crossed an edge: the other half shows up on the far side
+            self.screen.blit(sprite, (to_cell[0] * cell_size + offset_x - step_x * cell_size,
+                                      to_cell[1] * cell_size + offset_y - step_y * cell_size))
+
+
+def wrapped_delta(a, b, board_size):
+    # Signed distance from a to b the shorter way around the torus
+    half = board_size // 2
+    return (b - a + half) % board_size - half
+
+
+class ViewportRenderer:
+    # For boards bigger than the window. A camera centred on the head scrolls
+    # over the board and wraps at the edges the same way the snake does. Only
+    # the cells inside the window are looked at, so a frame costs the same on
+    # a 500x500 board as on a 20x20 one. The view moves every frame, so it is
+    # always painted in full. An apple outside the view is pinned to the
+    # window edge in its direction. Swarm items are looked up in their grid
+    # for the visible cells only, like the body.
+    def __init__(self, screen, atlas, board_size, cell_size, grid=False, profiler=None):
+        self.screen = screen
+        self.atlas = atlas
+        self.board_size = board_size
+        self.cell_size = cell_size
+        self.profiler = profiler or FrameProfiler()
+        self.item_sprites = None
+        self.width, self.height = screen.get_size()
+        self.board_pixels = board_size * cell_size
+        if self.board_pixels < max(self.width, self.height):
+            raise ValueError('The board fits in the window, use BoardRenderer')
+        self.columns = self.width // cell_size + 2
+        self.rows = self.height // cell_size + 2
+        # One cell larger than the window so it can be shifted by the scroll
+        # offset; the grid repeats every cell so it lines up after the shift
+        self.background = pygame.Surface((self.width + cell_size, self.height + cell_size)).convert()
+        self.background.fill(BACKGROUND_COLOR)
+        if grid:
+            with self.profiler.phase('draw_grid'):
+                draw_grid(self.background, max(self.columns, self.rows), cell_size)
+        self.reset()
+
+    def reset(self):
+        self.ticks = None
+        self.head = None
+        self.prev_head = None
+
+    def draw(self, game, texts, alpha=1.0):
+        with self.profiler.phase('draw'):
+            self._draw_view(game, texts, alpha)
+        with self.profiler.phase('flip'):
+            pygame.display.flip()
+
+    def _draw_view(self, game, texts, alpha):
+        snake = game.snake
+        if self.ticks is not None and game.ticks == self.ticks + 1:
+            self.prev_head = self.head
+        elif self.ticks != game.ticks:
+            self.prev_head = None
+        sliding = self.prev_head is not None and alpha < 1.0
+
+        size = self.board_size
+        cell_size = self.cell_size
+        head_x, head_y = snake.head
+        if sliding:
+            head_px = self._slid(self.prev_head, snake.head, alpha)
+        else:
+            head_px = (head_x * cell_size, head_y * cell_size)
+        # Board pixel at the top left corner of the window
+        self.left = head_px[0] + cell_size // 2 - self.width // 2
+        self.top = head_px[1] + cell_size // 2 - self.height // 2
+        first_column, offset_x = divmod(self.left, cell_size)
+        first_row, offset_y = divmod(self.top, cell_size)
+
+        screen = self.screen
+        screen.blit(self.background, (-offset_x, -offset_y))
+
+        # Cull to the visible cells; the head cell is skipped and drawn below
+        grid = snake.grid
+        body = self.atlas.body
+        kinds = game.items.kinds if game.items is not None else None
+        if kinds is not None and self.item_sprites is None:
+            self.item_sprites = [None] + [self.atlas.get(None, kind) for kind in ITEM_KINDS]
+        head_index = head_y * size + head_x
+        columns = [(column % size, column * cell_size - self.left)
+                   for column in range(first_column, first_column + self.columns)]
+        blits = []
+        for row in range(first_row, first_row + self.rows):
+            base = (row % size) * size
+            y = row * cell_size - self.top
+            for x_cell, x in columns:
+                index = base + x_cell
+                if grid[index]:
+                    if index != head_index:
+                        blits.append((body, (x, y)))
+                elif kinds is not None and kinds[index]:
+                    blits.append((self.item_sprites[kinds[index]], (x, y)))
+        screen.blits(blits, doreturn=False)
+
+        if sliding and snake.vacated is not None:
+            screen.blit(body, self._to_screen(self._slid(snake.vacated, snake.tail, alpha)))
+        screen.blit(self.atlas.head, self._to_screen(head_px))
+        if game.apple is not None:
+            self._draw_apple(game.apple, snake.head)
+        screen.blits(texts, doreturn=False)
+
+        self.ticks = game.ticks
+        self.head = snake.head
+
+    def _slid(self, from_cell, to_cell, alpha):
+        # Board pixel of a sprite `alpha` of the way along a one cell move
+        cell_size = self.cell_size
+        step_x = wrapped_step(from_cell[0], to_cell[0], self.board_size)
+        step_y = wrapped_step(from_cell[1], to_cell[1], self.board_size)
+        return (from_cell[0] * cell_size + round(step_x * alpha * cell_size),
+                from_cell[1] * cell_size + round(step_y * alpha * cell_size))
+
+    def _to_screen(self, pixel):
+        # Window position of a board pixel, taking the shorter way around
+        board_pixels = self.board_pixels
+        x = (pixel[0] - self.left) % board_pixels
+        y = (pixel[1] - self.top) % board_pixels
+        if x > board_pixels - self.cell_size:
+            x -= board_pixels
+        if y > board_pixels - self.cell_size:
+            y -= board_pixels
+        return (x, y)
+
+    def _draw_apple(self, apple, head):
+        cell_size = self.cell_size
+        x, y = self._to_screen((apple[0] * cell_size, apple[1] * cell_size))
+        if not (x < self.width and y < self.height):
+            # Off screen: move it towards the head until it touches the window edge
+            dx = wrapped_delta(head[0], apple[0], self.board_size) * cell_size
+            dy = wrapped_delta(head[1], apple[1], self.board_size) * cell_size
+            half_x = (self.width - cell_size) / 2
+            half_y = (self.height - cell_size) / 2
+            scale = min(half_x / abs(dx) if dx else 1.0, half_y / abs(dy) if dy else 1.0)
+            x = round(half_x + dx * scale)
+            y = round(half_y + dy * scale)
+        self.screen.blit(self.atlas.apple, (x, y))
+
+
+def make_renderer(screen, atlas, board_size, cell_size, grid=False, full_redraw=False, profiler=None):
+    # The fixed board view when the whole board fits in the window, otherwise a scrolling camera
+    width, height = screen.get_size()
+    if board_size * cell_size <= min(width, height):
+        return BoardRenderer(screen, atlas, board_size, cell_size, grid, full_redraw, profiler)
+    return ViewportRenderer(screen, atlas, board_size, cell_size, grid, profiler)
@@ -0,0 +1,165 @@
+import struct
+
+from snakegame.game import GameState
+from snakegame.policies import MOVES
+
+# File layout (little endian):
+#   b'SNKR', version u8, board size u16, seed u64, mode length u8 + mode,
+#   then varints: ticks, apple count, status, turn count, and one varint per
+#   turn holding (ticks since the previous turn << 2) | index into MOVES.
+# Only direction changes are stored, so a game costs a byte or two per turn
+# no matter how long the snake goes straight.
+MAGIC = b'SNKR'
+VERSION = 1
+HEADER = struct.Struct('<4sBHQB')
+STATUSES = ('running', 'dead', 'cleared')
+
+
+class ReplayError(ValueError):
+    pass
+
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ReplayError('Replay is truncated')
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class Replay:
+    def __init__(self, seed, board_size, mode='', turns=None, ticks=0, apple_count=0, status='running'):
+        self.seed = seed
+        self.board_size = board_size
+        self.mode = mode
+        self.turns = turns if turns is not None else []  # (tick, direction) pairs
+        self.ticks = ticks
+        self.apple_count = apple_count
+        self.status = status
+
+    def to_bytes(self):
+        mode = self.mode.encode('ascii')
+        out = bytearray(HEADER.pack(MAGIC, VERSION, self.board_size, self.seed, len(mode)))
+        out += mode
+        write_varint(out, self.ticks)
+        write_varint(out, self.apple_count)
+        write_varint(out, STATUSES.index(self.status))
+        write_varint(out, len(self.turns))
+        previous = 0
+        for tick, direction in self.turns:
+            write_varint(out, (tick - previous) << 2 | MOVES.index(direction))
+            previous = tick
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < HEADER.size:
+            raise ReplayError('Replay is truncated')
+        magic, version, board_size, seed, mode_length = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ReplayError('Not a replay file, or from an unsupported version')
+        pos = HEADER.size
+        if pos + mode_length > len(data):
+            raise ReplayError('Replay is truncated')
+        try:
+            mode = data[pos:pos + mode_length].decode('ascii')
+        except UnicodeDecodeError:
+            raise ReplayError('Replay has a corrupt mode') from None
+        pos += mode_length
+        ticks, pos = read_varint(data, pos)
+        apple_count, pos = read_varint(data, pos)
+        status, pos = read_varint(data, pos)
+        if status >= len(STATUSES):
+            raise ReplayError(f'Replay has an unknown status {status}')
+        count, pos = read_varint(data, pos)
+        turns = []
+        tick = 0
+        for _ in range(count):
+            value, pos = read_varint(data, pos)
+            tick += value >> 2
+            turns.append((tick, MOVES[value & 3]))  # Two bits, always a move
+        return cls(seed, board_size, mode, turns, ticks, apple_count, STATUSES[status])
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+class ReplayRecorder:
+    # Wraps a seeded GameState and logs every tick where the direction changed
+    def __init__(self, state, mode=''):
+        if state.seed is None:
+            raise ValueError('Only games with a seed can be replayed')
+        self.state = state
+        self.replay = Replay(state.seed, state.board_size, mode)
+
+    def step(self, action=None):
+        state = self.state
+        direction = state.direction
+        status = state.step(action)
+        if state.direction != direction:
+            self.replay.turns.append((state.ticks, state.direction))
+        return status
+
+    def finish(self):
+        replay = self.replay
+        replay.ticks = self.state.ticks
+        replay.apple_count = self.state.apple_count
+        replay.status = self.state.status
+        return replay
+
+
+class ReplayPlayer:
+    # Re-simulates a replay tick by tick. Seeking backwards restarts from the
+    # seed, which is cheap since no rendering is involved.
+    def __init__(self, replay):
+        self.replay = replay
+        self.restart()
+
+    def restart(self):
+        self.state = GameState(self.replay.board_size, self.replay.seed)
+        self.next_turn = 0
+
+    @property
+    def finished(self):
+        return self.state.ticks >= self.replay.ticks or self.state.status != 'running'
+
+    def step(self):
+        turns = self.replay.turns
+        action = None
+        if self.next_turn < len(turns) and turns[self.next_turn][0] == self.state.ticks + 1:
+            action = turns[self.next_turn][1]
+            self.next_turn += 1
+        self.state.step(action)
+        return self.state
+
+    def seek(self, tick):
+        if tick < self.state.ticks:
+            self.restart()
+        while self.state.ticks < tick and not self.finished:
+            self.step()
+        return self.state
+
+
+def verify(replay):
+    # True when re-simulating the replay ends exactly where the recording did
+    state = ReplayPlayer(replay).seek(replay.ticks)
+    return (state.ticks, state.apple_count, state.status) == (replay.ticks, replay.apple_count, replay.status)
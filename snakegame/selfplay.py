@@ -0,0 +1,80 @@
+import multiprocessing
+import os
+from collections import Counter, namedtuple
+
+from snakegame.config import BOARD_SIZE
+from snakegame.game import GameState
+from snakegame.policies import make_policy
+from snakegame.snapshot import fork
+
+GameResult = namedtuple('GameResult', 'seed apples length ticks death_cause')
+
+# GameState.status -> death cause reported for a finished game
+DEATH_CAUSES = {'dead': 'self', 'cleared': 'cleared', 'running': 'tick_limit'}
+
+
+def play_game(seed, policy, board_size=BOARD_SIZE, max_ticks=100000, start=None, on_tick=None):
+    # `start` is a snapshot (bytes) to play on from instead of a new game;
+    # `on_tick(state)` is called after every tick, e.g. Heatmap.record
+    state = GameState(board_size, seed) if start is None else fork(start, seed)
+    while state.status == 'running' and state.ticks < max_ticks:
+        state.step(policy(state))
+        if on_tick is not None:
+            on_tick(state)
+    return state
+
+
+def game_result(seed, state):
+    return GameResult(seed, state.apple_count, len(state.snake), state.ticks, DEATH_CAUSES[state.status])
+
+
+def play_seed(job):
+    # Worker entry point. Only plain values cross the process boundary and
+    # nothing here touches data.json.
+    seed, policy_spec, board_size, max_ticks, start = job
+    state = play_game(seed, make_policy(policy_spec, seed), board_size, max_ticks, start)
+    return game_result(seed, state)
+
+
+class SelfPlayStats:
+    def __init__(self):
+        self.games = 0
+        self.apples = 0
+        self.ticks = 0
+        self.best_apples = 0
+        self.longest = 0
+        self.death_causes = Counter()
+
+    def add(self, result):
+        self.games += 1
+        self.apples += result.apples
+        self.ticks += result.ticks
+        self.best_apples = max(self.best_apples, result.apples)
+        self.longest = max(self.longest, result.length)
+        self.death_causes[result.death_cause] += 1
+
+    def merge(self, other):
+        self.games += other.games
+        self.apples += other.apples
+        self.ticks += other.ticks
+        self.best_apples = max(self.best_apples, other.best_apples)
+        self.longest = max(self.longest, other.longest)
+        self.death_causes.update(other.death_causes)
+
+
+def run_selfplay(games, seed=0, policy='random', workers=None, board_size=BOARD_SIZE,
+                 max_ticks=100000, chunksize=None, start=None):
+    # Yields a GameResult per game as soon as a worker finishes it (in completion
+    # order, not seed order). Seeds run from `seed` to `seed + games - 1`. With
+    # a `start` snapshot every game is a fork of it, the seed only decides
+    # where apples go from there.
+    workers = workers or os.cpu_count() or 1
+    jobs = [(seed + i, policy, board_size, max_ticks, start) for i in range(games)]
+    if workers == 1:
+        for job in jobs:
+            yield play_seed(job)
+        return
+    # Several games per message keeps the pipe overhead small next to the games
+    chunksize = chunksize or max(1, min(64, games // (workers * 8)))
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap_unordered(play_seed, jobs, chunksize)
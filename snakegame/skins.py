@@ -0,0 +1,129 @@
+import json
+import os
+
+from snakegame.config import SNAKE_COLORS, SPECIAL_SKINS
+
+SKIN_DIR = 'skins'
+
+
+class Skin:
+    # What a skin looks like. `key` is what data.json stores for it: the
+    # (r, g, b) tuple for a plain color, the id string for everything else.
+    # `style` names a body drawing strategy in sprites.BODY_STYLES.
+    def __init__(self, key, name, color, head_color=None, style='solid', unlock_games=None):
+        self.key = key
+        self.name = name
+        self.color = tuple(color)
+        self.head_color = tuple(head_color) if head_color else self.color
+        self.style = style
+        self.unlock_games = unlock_games
+
+    @classmethod
+    def from_definition(cls, definition):
+        # SPECIAL_SKINS entries and skin files share this format. Anything a
+        # file gets wrong raises ValueError here rather than breaking the
+        # sprites or the milestone table later on.
+        from snakegame.sprites import BODY_STYLES  # sprites imports this module
+
+        if not isinstance(definition, dict):
+            raise ValueError('a skin definition must be an object')
+        key = definition['id']
+        if not isinstance(key, str) or not key:
+            raise ValueError(f'skin id {key!r} is not a name')
+        color = check_color(definition['color'], 'color')
+        head_color = definition.get('head_color')
+        if head_color is not None:
+            head_color = check_color(head_color, 'head_color')
+        style = definition.get('style', 'solid')
+        if style not in BODY_STYLES:
+            raise ValueError(f'unknown style {style!r} for skin {key!r}')
+        unlock_games = definition.get('unlock_games')
+        if unlock_games is not None and (type(unlock_games) is not int or unlock_games < 1):
+            raise ValueError(f'unlock_games for skin {key!r} must be a positive whole number')
+        name = definition.get('name', key)
+        if not isinstance(name, str):
+            raise ValueError(f'name for skin {key!r} must be text')
+        return cls(key, name, color, head_color, style, unlock_games)
+
+
+def check_color(color, field):
+    # An (r, g, b) tuple of 0-255 ints, from a list in a skin file
+    if (not isinstance(color, (list, tuple)) or len(color) != 3
+            or any(type(c) is not int or not 0 <= c <= 255 for c in color)):
+        raise ValueError(f'{field} must be three whole numbers from 0 to 255, got {color!r}')
+    return tuple(color)
+
+
+class SkinRegistry:
+    # Every known skin by key, plus the games played milestone table. Built
+    # once at startup; everything after that is a dict lookup.
+    def __init__(self):
+        self.skins = {}
+        self.unlocks = {}  # games played -> skin keys it unlocks
+        self.starters = []  # Skins from files with no milestone, unlocked from the start
+
+    def add(self, skin, starter=False):
+        # Ids are unique; a skin file can't redefine a built-in skin or its milestone
+        if skin.key in self.skins:
+            raise ValueError(f'skin id {skin.key!r} is already taken')
+        self.skins[skin.key] = skin
+        if skin.unlock_games:
+            self.unlocks.setdefault(skin.unlock_games, []).append(skin.key)
+        elif starter:
+            self.starters.append(skin.key)
+
+    def resolve(self, key):
+        # Unknown colors still draw as themselves, anything else as the default skin
+        skin = self.skins.get(key)
+        if skin is None:
+            if isinstance(key, tuple):
+                skin = self.skins[key] = Skin(key, None, key)
+            else:
+                skin = self.skins[SNAKE_COLORS[0]]
+        return skin
+
+    def milestones(self):
+        return sorted(self.unlocks)
+
+    def load_dir(self, path):
+        # Each .json file holds one skin definition or a list of them
+        if not os.path.isdir(path):
+            return
+        for name in sorted(os.listdir(path)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(path, name)) as f:
+                    definitions = json.load(f)
+                if isinstance(definitions, dict):
+                    definitions = [definitions]
+                if not isinstance(definitions, list):
+                    raise ValueError('expected a skin definition or a list of them')
+            except (OSError, ValueError) as error:
+                print(f'Skipping skin file {name}: {error}')
+                continue
+            for definition in definitions:
+                try:
+                    self.add(Skin.from_definition(definition), starter=True)
+                except (ValueError, KeyError, TypeError) as error:
+                    print(f'Skipping a skin in {name}: {error}')
+
+
+def builtin_skins():
+    registry = SkinRegistry()
+    for color in SNAKE_COLORS:
+        registry.add(Skin(color, None, color))
+    for definition in SPECIAL_SKINS.values():
+        registry.add(Skin.from_definition(definition))
+    return registry
+
+
+_registry = None
+
+
+def get_registry(skin_dir=SKIN_DIR):
+    global _registry
+    if _registry is None:
+        _registry = builtin_skins()
+        _registry.load_dir(skin_dir)
+    return _registry
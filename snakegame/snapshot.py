@@ -0,0 +1,223 @@
+import os
+import random
+import struct
+import sys
+from array import array
+from collections import deque
+from itertools import chain
+
+from snakegame.config import MAX_BOARD_SIZE, MIN_BOARD_SIZE, MOVES
+from snakegame.engine import FreeCells, Snake
+from snakegame.game import GameState
+from snakegame.replay import STATUSES, Replay, ReplayError
+from snakegame.swarm import ITEM_KINDS, ItemGrid, SwarmState
+
+# A game in progress, exactly as it stands, so it can carry on later or be
+# forked into any number of copies. File layout (little endian):
+#   b'SNKS', version u8, flags u8, board size u16, seed u64, mode length u8 + mode,
+#   ticks u32, apple count u32, status u8, direction u8, apple cell i32,
+#   pending growth u32, segment count u32, then the segments from the head
+#   as (x, y) pairs of u8 (boards up to 256) or u16, the occupancy grid at
+#   one byte per cell, the free cells, then the RNG: its 625 u32 words and
+#   gauss_next (flag u8 + f64).
+# Swarm games add density f64, apples on the board u32, power-up entry
+# count u32 and effect count u8, one byte per cell of item kinds,
+# (expiry tick, cell) u32 pairs, (item kind u8, end tick u32) per effect,
+# and the open cells.
+# Free and open cells are a u32 count and the cells (u16 when every cell
+# fits, else u32) in FreeCells order, because that order decides where the
+# next apple goes; without it a resumed game would stop matching its replay.
+# With FLAG_REPLAY the game's replay so far follows, as u32 length + bytes.
+#
+# Everything that is per cell or per segment goes through array and bytes
+# copies rather than Python loops, so a board-filling snake on a 500x500
+# board still saves and loads in milliseconds.
+MAGIC = b'SNKS'
+VERSION = 1
+HEADER = struct.Struct('<4sBBHQB')
+STATE = struct.Struct('<IIBBiII')
+GAUSS = struct.Struct('<Bd')
+SWARM = struct.Struct('<dIIB')
+EFFECT = struct.Struct('<BI')
+LENGTH = struct.Struct('<I')
+FLAG_SEED = 1
+FLAG_SWARM = 2
+FLAG_REPLAY = 4
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def _pack(typecode, values):
+    packed = array(typecode, values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack(typecode, data, pos, count):
+    values = array(typecode)
+    end = pos + count * values.itemsize
+    if end > len(data):
+        raise SnapshotError('Snapshot is truncated')
+    values.frombytes(data[pos:end])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values, end
+
+
+def _coordinate_typecode(board_size):
+    return 'B' if board_size <= 1 << 8 else 'H'
+
+
+def _cell_typecode(board_size):
+    return 'H' if board_size * board_size <= 1 << 16 else 'I'
+
+
+def _pack_cells(free):
+    return LENGTH.pack(len(free.cells)) + _pack(_cell_typecode(free.board_size), free.cells)
+
+
+def _unpack_cells(data, pos, board_size):
+    if pos + LENGTH.size > len(data):
+        raise SnapshotError('Snapshot is truncated')
+    count, = LENGTH.unpack_from(data, pos)
+    cells, pos = _unpack(_cell_typecode(board_size), data, pos + LENGTH.size, count)
+    return FreeCells.from_cells(board_size, cells), pos
+
+
+def dumps(state, mode='', replay=None):
+    size = state.board_size
+    swarm = isinstance(state, SwarmState)
+    flags = (FLAG_SEED if state.seed is not None else 0) | (FLAG_SWARM if swarm else 0) | \
+        (FLAG_REPLAY if replay is not None else 0)
+    mode = mode.encode('ascii')
+    snake = state.snake
+    apple = -1 if state.apple is None else state.apple[1] * size + state.apple[0]
+    _, words, gauss_next = state.rng.getstate()
+    out = [
+        HEADER.pack(MAGIC, VERSION, flags, size, state.seed or 0, len(mode)),
+        mode,
+        STATE.pack(state.ticks, state.apple_count, STATUSES.index(state.status), MOVES.index(state.direction),
+                   apple, snake.pending_growth, len(snake.body)),
+        _pack(_coordinate_typecode(size), chain.from_iterable(snake.body)),
+        bytes(snake.grid),
+        _pack_cells(snake.free),
+        _pack('I', words),
+        GAUSS.pack(gauss_next is not None, gauss_next or 0.0),
+    ]
+    if swarm:
+        out.append(SWARM.pack(state.density, state.apples, len(state.expiries), len(state.effects)))
+        out.append(bytes(state.items.kinds))
+        out.append(_pack('I', chain.from_iterable(state.expiries)))
+        out.extend(EFFECT.pack(ITEM_KINDS.index(name), end) for name, end in state.effects.items())
+        out.append(_pack_cells(state.items.open))
+    if replay is not None:
+        replay_bytes = replay.to_bytes()
+        out.append(LENGTH.pack(len(replay_bytes)))
+        out.append(replay_bytes)
+    return b''.join(out)
+
+
+def loads(data):
+    # Returns (state, mode, replay); replay is None unless one was saved
+    data = memoryview(data)
+    if len(data) < HEADER.size:
+        raise SnapshotError('Snapshot is truncated')
+    magic, version, flags, size, seed, mode_length = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise SnapshotError('Not a snapshot file, or from an unsupported version')
+    if not MIN_BOARD_SIZE <= size <= MAX_BOARD_SIZE:
+        raise SnapshotError(f'Snapshot has an unplayable board size {size}')
+    try:
+        pos = HEADER.size
+        mode = bytes(data[pos:pos + mode_length]).decode('ascii')
+        pos += mode_length
+        ticks, apple_count, status, direction, apple, pending_growth, length = STATE.unpack_from(data, pos)
+        pos += STATE.size
+        coordinates, pos = _unpack(_coordinate_typecode(size), data, pos, length * 2)
+        grid, pos = _unpack('B', data, pos, size * size)
+        free, pos = _unpack_cells(data, pos, size)
+        words, pos = _unpack('I', data, pos, 625)
+        has_gauss, gauss_next = GAUSS.unpack_from(data, pos)
+        pos += GAUSS.size
+
+        # Built field by field: the constructors would start a fresh game first
+        snake = Snake.__new__(Snake)
+        snake.board_size = size
+        snake.body = deque(zip(coordinates[::2], coordinates[1::2]))
+        snake.grid = bytearray(grid)
+        snake.free = free
+        snake.pending_growth = pending_growth
+        snake.collided = False
+        snake.vacated = None
+
+        state = SwarmState.__new__(SwarmState) if flags & FLAG_SWARM else GameState.__new__(GameState)
+        state.board_size = size
+        state.seed = seed if flags & FLAG_SEED else None
+        state.rng = random.Random()
+        state.rng.setstate((3, tuple(words), gauss_next if has_gauss else None))
+        state.snake = snake
+        state.direction = MOVES[direction]
+        state.apple = None if apple < 0 else (apple % size, apple // size)
+        state.apple_count = apple_count
+        state.ticks = ticks
+        state.status = STATUSES[status]
+        state.ate_apple = False
+
+        if flags & FLAG_SWARM:
+            density, apples, expiry_count, effect_count = SWARM.unpack_from(data, pos)
+            pos += SWARM.size
+            kinds, pos = _unpack('B', data, pos, size * size)
+            expiries, pos = _unpack('I', data, pos, expiry_count * 2)
+            state.effects = {}
+            for _ in range(effect_count):
+                kind, end = EFFECT.unpack_from(data, pos)
+                pos += EFFECT.size
+                state.effects[ITEM_KINDS[kind]] = end
+            items = ItemGrid.__new__(ItemGrid)
+            items.board_size = size
+            items.kinds = bytearray(kinds)
+            items.count = size * size - items.kinds.count(0)
+            items.changed = None
+            items.open, pos = _unpack_cells(data, pos, size)
+            state.density = density
+            state.items = items
+            state.apples = apples
+            state.expiries = deque(zip(expiries[::2], expiries[1::2]))
+            # The newest entry for a cell belongs to the power-up still there, if any
+            state.power_up_expiry = {cell: tick for tick, cell in state.expiries if items.kinds[cell] > 1}
+
+        replay = None
+        if flags & FLAG_REPLAY:
+            replay_length, = LENGTH.unpack_from(data, pos)
+            pos += LENGTH.size
+            replay = Replay.from_bytes(bytes(data[pos:pos + replay_length]))
+    except (SnapshotError, ReplayError):
+        raise
+    except (struct.error, IndexError, ValueError) as error:
+        raise SnapshotError(f'Snapshot is damaged: {error}') from error
+    return state, mode, replay
+
+
+def fork(data, seed):
+    # A copy of the snapshotted game whose apples (and power-ups) from here
+    # on come from `seed`, so many forks of one position play out differently
+    state, _, _ = loads(data)
+    state.rng.seed(seed)
+    return state
+
+
+def save(path, state, mode='', replay=None):
+    # Written next to the target and renamed over it, so an old snapshot is
+    # never left half overwritten
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(dumps(state, mode, replay))
+    os.replace(tmp_path, path)
+
+
+def load(path):
+    with open(path, 'rb') as f:
+        return loads(f.read())
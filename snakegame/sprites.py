@@ -0,0 +1,132 @@
+import pygame
+
+from snakegame.config import APPLE_COLOR, POWER_UPS
+from snakegame.skins import get_registry
+
+
+def darken_color(color, factor=0.7):
+    return tuple(max(0, min(255, int(c * factor))) for c in color)
+
+
+def draw_head_with_pattern(surface, color, cell_size):
+    # Get the darker color for the head
+    dark_color = darken_color(color)
+
+    # Draw the head block with the darker color
+    surface.fill(dark_color, pygame.Rect(0, 0, cell_size, cell_size))
+
+    # Create a surface for the pattern with transparency support
+    pattern_surface = pygame.Surface((cell_size, cell_size), pygame.SRCALPHA)
+
+    # Define the pattern color (slightly lighter than the head color)
+    pattern_color = (
+        min(255, dark_color[0] + 40),
+        min(255, dark_color[1] + 40),
+        min(255, dark_color[2] + 40)
+    )
+
+    # Draw the snake-like pattern (e.g., scales)
+    scale_radius = max(1, cell_size // 6)  # Tiny cells still get a pattern
+    for y in range(0, cell_size, scale_radius * 2):
+        for x in range((y // scale_radius) % 2 * scale_radius, cell_size, scale_radius * 2):
+            pygame.draw.circle(pattern_surface, pattern_color, (x + scale_radius, y + scale_radius), scale_radius)
+
+    # Blit the pattern onto the head block
+    surface.blit(pattern_surface, (0, 0))
+
+
+def draw_solid_block(color, cell_size):
+    sprite = pygame.Surface((cell_size, cell_size))
+    sprite.fill(color)
+    return sprite.convert()
+
+
+def draw_hollow_block(color, cell_size):
+    # Draw hollow rectangle (only the edges)
+    sprite = pygame.Surface((cell_size, cell_size), pygame.SRCALPHA)
+    pygame.draw.rect(sprite, color, pygame.Rect(0, 0, cell_size, cell_size), width=2)
+    return sprite.convert_alpha()
+
+
+def draw_power_up(color, cell_size):
+    sprite = pygame.Surface((cell_size, cell_size), pygame.SRCALPHA)
+    pygame.draw.circle(sprite, color, (cell_size // 2, cell_size // 2), cell_size // 2 - 1)
+    return sprite.convert_alpha()
+
+
+# Body drawing strategy for each Skin.style
+BODY_STYLES = {
+    'solid': draw_solid_block,
+    'hollow': draw_hollow_block,
+}
+
+
+class SpriteAtlas:
+    # Every head, body, apple and power-up tile is drawn once per (skin, role, cell size)
+    # and converted to the display format, so drawing the snake is just blits.
+    # Skins are looked up in the registry only when a tile is first built.
+    # Needs a display mode to be set before the first sprite is built.
+    def __init__(self, cell_size, skins=None):
+        self.cell_size = cell_size
+        self.skins = skins or get_registry()
+        self.sprites = {}
+        self.hits = 0
+        self.misses = 0
+        self.skin = None
+        self.head = None
+        self.body = None
+        self.apple = None
+
+    def get(self, skin, role):
+        key = (skin, role, self.cell_size)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            self.misses += 1
+            sprite = self.sprites[key] = self._render(skin, role)
+        else:
+            self.hits += 1
+        return sprite
+
+    def _render(self, skin, role):
+        size = self.cell_size
+        if role == 'apple':
+            return draw_solid_block(APPLE_COLOR, size)
+        if role in POWER_UPS:
+            return draw_power_up(POWER_UPS[role]['color'], size)
+        resolved = self.skins.resolve(skin)
+        if role == 'head':
+            sprite = pygame.Surface((size, size))
+            draw_head_with_pattern(sprite, resolved.head_color, size)
+            return sprite.convert()
+        return BODY_STYLES.get(resolved.style, draw_solid_block)(resolved.color, size)
+
+    def prerender(self):
+        for _ in self.prerender_steps():
+            pass
+
+    def prerender_steps(self):
+        # prerender() one skin per step, for spreading it over idle time
+        for skin in list(self.skins.skins):
+            self.get(skin, 'head')
+            self.get(skin, 'body')
+            yield
+        self.get(None, 'apple')
+
+    def use_skin(self, skin):
+        # Rebinds the active head/body tiles, only when the skin actually changed
+        if skin == self.skin and self.head is not None:
+            return
+        self.skin = skin
+        self.head = self.get(skin, 'head')
+        self.body = self.get(skin, 'body')
+        self.apple = self.get(None, 'apple')
+
+    def invalidate(self, cell_size=None):
+        # Drops every tile, e.g. after the display format or cell size changed
+        self.sprites.clear()
+        self.skin = self.head = self.body = self.apple = None
+        if cell_size is not None:
+            self.cell_size = cell_size
+
+    def report(self):
+        return f'Sprite cache: {len(self.sprites)} sprites, {self.hits} hits, {self.misses} misses'
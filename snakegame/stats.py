@@ -0,0 +1,103 @@
+import sqlite3
+import time
+from collections import namedtuple
+
+Totals = namedtuple('Totals', 'games deaths apples best ticks duration length')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    played_at REAL NOT NULL,
+    mode TEXT NOT NULL,
+    apples INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    ticks INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    death_cause TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_mode ON games (mode);
+CREATE TABLE IF NOT EXISTS totals (
+    mode TEXT PRIMARY KEY,
+    games INTEGER NOT NULL,
+    deaths INTEGER NOT NULL,
+    apples INTEGER NOT NULL,
+    best INTEGER NOT NULL,
+    ticks INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+'''
+
+ALL_MODES = ''  # totals row that covers every mode
+
+
+class StatsStore:
+    # Per-game history in SQLite. A finished game is one appended row plus an
+    # update of the running totals for its mode and for all modes, in one
+    # transaction, so the statistics screen reads a few rows no matter how
+    # many games were played. Recent games come off the end of the rowid.
+    def __init__(self, path='stats.db'):
+        # The game opens the store on a startup thread and uses it on the main one
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        # WAL turns a commit into an append, which is all a game over needs
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+
+    def migrate_legacy(self, data):
+        # The lifetime counters from data.json become the starting totals.
+        # Runs once per database; returns True if it did anything.
+        with self.db:
+            if self.db.execute("SELECT 1 FROM meta WHERE key = 'legacy_migrated'").fetchone():
+                return False
+            self._add_totals(ALL_MODES, Totals(
+                games=data.get('games_played', 0),
+                deaths=data.get('total_deaths', 0),
+                apples=data.get('total_apples', 0),
+                best=0, ticks=0, duration=0.0, length=0,
+            ))
+            self.db.execute("INSERT INTO meta (key, value) VALUES ('legacy_migrated', ?)", (str(time.time()),))
+        return True
+
+    def record_game(self, mode, apples, length, ticks, duration, death_cause, played_at=None):
+        played_at = time.time() if played_at is None else played_at
+        game = Totals(1, int(death_cause != 'cleared'), apples, apples, ticks, duration, length)
+        with self.db:
+            self.db.execute(
+                'INSERT INTO games (played_at, mode, apples, length, ticks, duration, death_cause) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (played_at, mode, apples, length, ticks, duration, death_cause))
+            self._add_totals(ALL_MODES, game)
+            self._add_totals(mode, game)
+
+    def _add_totals(self, mode, totals):
+        self.db.execute(
+            'INSERT INTO totals (mode, games, deaths, apples, best, ticks, duration, length) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (mode) DO UPDATE SET games = games + excluded.games, '
+            'deaths = deaths + excluded.deaths, apples = apples + excluded.apples, '
+            'best = max(best, excluded.best), ticks = ticks + excluded.ticks, '
+            'duration = duration + excluded.duration, length = length + excluded.length',
+            (mode,) + tuple(totals))
+
+    def totals(self, mode=ALL_MODES):
+        row = self.db.execute(
+            'SELECT games, deaths, apples, best, ticks, duration, length FROM totals WHERE mode = ?',
+            (mode,)).fetchone()
+        return Totals(*row) if row else Totals(0, 0, 0, 0, 0, 0.0, 0)
+
+    def recent(self, count=10, mode=None):
+        # Apples of the last `count` games, oldest first
+        if mode is None:
+            rows = self.db.execute('SELECT apples FROM games ORDER BY id DESC LIMIT ?', (count,))
+        else:
+            rows = self.db.execute('SELECT apples FROM games WHERE mode = ? ORDER BY id DESC LIMIT ?',
+                                   (mode, count))
+        return [apples for apples, in rows][::-1]
+
+    def close(self):
+        self.db.close()
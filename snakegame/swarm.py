@@ -0,0 +1,135 @@
+from collections import deque
+
+from snakegame.config import BOARD_SIZE, POWER_UP_INTERVAL, POWER_UP_LIFETIME, POWER_UPS, SWARM_DENSITY
+from snakegame.engine import FreeCells
+from snakegame.game import GameState
+
+# Item kinds as stored in ItemGrid.kinds; 0 is an empty cell
+ITEM_KINDS = ('apple',) + tuple(POWER_UPS)
+APPLE = 1
+
+
+class ItemGrid:
+    # Every item on the board, indexed by cell (y * board_size + x) in a
+    # bytearray, so finding what the head landed on is one lookup. The cells
+    # with neither snake nor item are kept in a FreeCells, so placing an item
+    # is O(1) however crowded the board is. Once a renderer keeps a layer of
+    # the items, cells whose item came or went are queued in `changed` for
+    # it; until then `changed` is None and nothing is queued.
+    def __init__(self, snake):
+        size = snake.board_size
+        self.board_size = size
+        self.kinds = bytearray(size * size)
+        self.open = FreeCells(size)
+        for x, y in snake:
+            self.open.discard(y * size + x)
+        self.count = 0
+        self.changed = None
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        # (cell index, kind) of every item; walks the whole board
+        return ((cell, kind) for cell, kind in enumerate(self.kinds) if kind)
+
+    def spawn(self, kind, rng):
+        # Puts an item on a random open cell; returns the cell, or None when there is none
+        if not self.open.cells:
+            return None
+        cell = self.open.cells[rng.randrange(len(self.open.cells))]
+        self.open.discard(cell)
+        self.kinds[cell] = kind
+        self.count += 1
+        if self.changed is not None:
+            self.changed.append(cell)
+        return cell
+
+    def take(self, cell):
+        # Removes and returns the kind of item at `cell` (0 if none). The
+        # snake's head is there, so the cell doesn't become open.
+        kind = self.kinds[cell]
+        if kind:
+            self.kinds[cell] = 0
+            self.count -= 1
+            if self.changed is not None:
+                self.changed.append(cell)
+        return kind
+
+    def remove(self, cell):
+        if self.take(cell):
+            self.open.add(cell)
+
+
+class SwarmState(GameState):
+    # Swarm mode: `density` of the board is covered in apples, and every
+    # eaten apple is replaced somewhere else, so the count stays put until
+    # the board fills up. Every POWER_UP_INTERVAL ticks a power-up appears
+    # for POWER_UP_LIFETIME ticks; taking one turns its effect on for the
+    # duration in POWER_UPS. Nothing in a tick looks at more than a few
+    # items, so a tick costs the same with ten apples or ten thousand.
+    def __init__(self, board_size=BOARD_SIZE, seed=None, density=SWARM_DENSITY):
+        self.density = density
+        super().__init__(board_size, seed)
+
+    def reset(self):
+        super().reset()
+        self.apple = None  # Apples live in self.items
+        self.items = ItemGrid(self.snake)
+        self.apples = 0  # Apples on the board
+        for _ in range(max(1, round(self.density * self.board_size * self.board_size))):
+            if self.items.spawn(APPLE, self.rng) is None:
+                break
+            self.apples += 1
+        self.effects = {}  # Power-up name -> tick its effect ends
+        self.expiries = deque()  # (tick, cell) of each power-up on the board, oldest first
+        self.power_up_expiry = {}  # cell -> tick, to tell a taken power-up's entry from a newer one
+
+    def active(self, effect):
+        return self.effects.get(effect, 0) > self.ticks
+
+    def step(self, action=None):
+        size = self.board_size
+        snake = self.snake
+        items = self.items
+        super().step(action)
+        if snake.vacated is not None:
+            items.open.add(snake.vacated[1] * size + snake.vacated[0])
+        head = snake.head[1] * size + snake.head[0]
+        items.open.discard(head)
+        if self.status != 'running':
+            return self.status
+
+        kind = items.take(head)
+        if kind == APPLE:
+            if not self.active('diet'):
+                snake.grow()
+            self.apple_count += 1
+            self.ate_apple = True
+            if items.spawn(APPLE, self.rng) is None:
+                self.apples -= 1
+                if not self.apples:
+                    self.status = 'cleared'
+        elif kind:
+            name = ITEM_KINDS[kind - 1]
+            self.effects[name] = self.ticks + POWER_UPS[name]['duration']
+            self.power_up_expiry.pop(head, None)
+
+        self._update_power_ups()
+        return self.status
+
+    def _update_power_ups(self):
+        expiries = self.expiries
+        while expiries and expiries[0][0] <= self.ticks:
+            tick, cell = expiries.popleft()
+            # Skip entries for power-ups that were taken in the meantime
+            if self.power_up_expiry.get(cell) == tick:
+                del self.power_up_expiry[cell]
+                self.items.remove(cell)
+        if self.ticks % POWER_UP_INTERVAL == 0:
+            kind = self.rng.randrange(APPLE + 1, len(ITEM_KINDS) + 1)
+            cell = self.items.spawn(kind, self.rng)
+            if cell is not None:
+                tick = self.ticks + POWER_UP_LIFETIME
+                expiries.append((tick, cell))
+                self.power_up_expiry[cell] = tick